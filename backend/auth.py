@@ -2,9 +2,13 @@ from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from config import settings
+from metrics import PASSWORD_POOL_WAIT, PASSWORD_POOL_REJECTED
 from fastapi import HTTPException, status
 from typing import Optional
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import asyncio
 import hashlib
+import time
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__truncate_error=True)
 
@@ -23,6 +27,95 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     pre_hashed = _pre_hash_password(plain_password)
     return pwd_context.verify(pre_hashed, hashed_password)
 
+# Bounded worker pool for bcrypt so hashing never blocks the event loop
+_password_executor = None
+_password_jobs_in_flight = 0
+_password_pool_stats = {
+    "submitted": 0,
+    "rejected": 0,
+    "completed": 0,
+    "wait_seconds_total": 0.0,
+    "wait_seconds_max": 0.0,
+    "run_seconds_total": 0.0,
+}
+
+def _get_password_executor():
+    """Lazily create the executor configured in settings"""
+    global _password_executor
+    if _password_executor is None:
+        if settings.password_hash_executor == "process":
+            _password_executor = ProcessPoolExecutor(max_workers=settings.password_hash_workers)
+        else:
+            _password_executor = ThreadPoolExecutor(
+                max_workers=settings.password_hash_workers,
+                thread_name_prefix="bcrypt"
+            )
+    return _password_executor
+
+def _timed_call(func, *args):
+    """Run func in a worker and report how long the work itself took"""
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+async def _run_in_password_pool(func, *args):
+    """Submit a bcrypt job to the pool, rejecting it when the queue is full"""
+    global _password_jobs_in_flight
+    if _password_jobs_in_flight >= settings.password_hash_max_queue:
+        _password_pool_stats["rejected"] += 1
+        PASSWORD_POOL_REJECTED.inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication service is busy, please retry",
+            headers={"Retry-After": "1"},
+        )
+    
+    _password_jobs_in_flight += 1
+    _password_pool_stats["submitted"] += 1
+    submitted = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        result, run_seconds = await loop.run_in_executor(
+            _get_password_executor(), _timed_call, func, *args
+        )
+    finally:
+        _password_jobs_in_flight -= 1
+    
+    # Wait time is everything that was not spent hashing: queueing plus dispatch
+    wait_seconds = max(time.perf_counter() - submitted - run_seconds, 0.0)
+    _password_pool_stats["completed"] += 1
+    _password_pool_stats["run_seconds_total"] += run_seconds
+    _password_pool_stats["wait_seconds_total"] += wait_seconds
+    _password_pool_stats["wait_seconds_max"] = max(_password_pool_stats["wait_seconds_max"], wait_seconds)
+    PASSWORD_POOL_WAIT.observe(value=wait_seconds)
+    return result
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password in the bcrypt worker pool"""
+    return await _run_in_password_pool(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password in the bcrypt worker pool"""
+    return await _run_in_password_pool(verify_password, plain_password, hashed_password)
+
+def get_password_pool_stats() -> dict:
+    """Snapshot of bcrypt pool queue depth and timings"""
+    completed = _password_pool_stats["completed"]
+    return {
+        **_password_pool_stats,
+        "in_flight": _password_jobs_in_flight,
+        "max_queue": settings.password_hash_max_queue,
+        "workers": settings.password_hash_workers,
+        "wait_seconds_avg": _password_pool_stats["wait_seconds_total"] / completed if completed else 0.0,
+    }
+
+def shutdown_password_pool():
+    """Stop the bcrypt worker pool"""
+    global _password_executor
+    if _password_executor is not None:
+        _password_executor.shutdown(wait=False, cancel_futures=True)
+        _password_executor = None
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
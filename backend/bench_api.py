@@ -0,0 +1,221 @@
+"""End-to-end API benchmark.
+
+Runs the FastAPI app in-process (httpx ASGI transport) against a local
+mongod (--mongodb-uri) or the in-memory Motor stand-in (default), drives
+realistic scenarios with concurrent clients and prints JSON with
+throughput, p50/p95/p99 latency and Mongo commands per request.
+
+Usage:
+    pip install -r requirements-bench.txt
+    python bench_api.py --users 50 --concurrency 20 --output bench.json
+"""
+from datetime import datetime
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import time
+
+def _percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+def _mongo_command_total() -> float:
+    from metrics import MONGO_COMMANDS
+    with MONGO_COMMANDS._lock:
+        return sum(MONGO_COMMANDS._values.values())
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+async def run_scenario(name: str, client, make_request, total: int, concurrency: int) -> dict:
+    """Issue `total` requests from `concurrency` concurrent clients"""
+    latencies = []
+    errors = 0
+    exceptions = {}
+    next_index = 0
+    
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < total:
+            index = next_index
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                response = await make_request(client, index)
+            except Exception as e:
+                # e.g. an operator the in-memory stand-in does not implement
+                latencies.append(time.perf_counter() - started)
+                errors += 1
+                exceptions[type(e).__name__] = exceptions.get(type(e).__name__, 0) + 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+    
+    commands_before = _mongo_command_total()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    commands = _mongo_command_total() - commands_before
+    
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "concurrency": concurrency,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+        "mongo_commands_per_request": round(commands / total, 2) if total else 0.0,
+        "exceptions": exceptions,
+    }
+
+async def setup(args):
+    """Import the app and point it at a real mongod or the in-memory stand-in"""
+    if args.mongodb_uri:
+        os.environ["MONGODB_URI"] = args.mongodb_uri
+    else:
+        os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017/lms_bench")
+    os.environ.setdefault("JWT_SECRET", "bench-secret")
+    
+    import main
+    from database import get_database, INDEX_SPEC
+    from seeding import seed_database
+    
+    if args.mongodb_uri:
+        await main.startup_db_client()
+        db = get_database()
+    else:
+        from inmemory_motor import InMemoryDatabase
+        db = InMemoryDatabase()
+        for collection_name, models in INDEX_SPEC.items():
+            await db[collection_name].create_indexes(models)
+        await seed_database(db)
+        main.app.dependency_overrides[get_database] = lambda: db
+    
+    return main, db
+
+async def prebuild_user_stats(db, emails: list):
+    """Create the (empty) stats documents of fresh bench users.
+    
+    The lazy build on first dashboard read aggregates with $convert, which
+    mongomock lacks; brand-new users have no history, so the empty document
+    is exactly what that build would produce.
+    """
+    from user_stats import _empty_stats
+    users = await db.users.find({"email": {"$in": emails}}, {"_id": 1}).to_list(length=None)
+    if users:
+        await db.user_stats.insert_many([_empty_stats(str(user["_id"])) for user in users])
+
+async def run(args) -> dict:
+    import httpx
+    
+    main, db = await setup(args)
+    transport = httpx.ASGITransport(app=main.app)
+    run_id = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+    emails = [f"bench-{run_id}-{i}@example.com" for i in range(args.users)]
+    password = "bench-password"
+    tokens = {}
+    
+    courses = await db.courses.find({}, {"_id": 1}).to_list(length=None)
+    course_ids = [str(c["_id"]) for c in courses]
+    quizzes = await db.quizzes.find({}, {"_id": 1, "question_count": 1}).to_list(length=None)
+    
+    def auth(index: int) -> dict:
+        return {"Authorization": f"Bearer {tokens[index % args.users]}"}
+    
+    async def register(client, index):
+        return await client.post("/api/auth/register", json={"email": emails[index], "password": password})
+    
+    async def login(client, index):
+        response = await client.post("/api/auth/login", json={"email": emails[index], "password": password})
+        if response.status_code == 200:
+            tokens[index] = response.json()["access_token"]
+        return response
+    
+    async def browse_catalog(client, index):
+        return await client.get("/api/courses")
+    
+    async def course_detail(client, index):
+        return await client.get(f"/api/courses/{course_ids[index % len(course_ids)]}")
+    
+    async def enroll(client, index):
+        course_id = course_ids[(index // args.users) % len(course_ids)]
+        return await client.post("/api/enrollments", json={"course_id": course_id}, headers=auth(index))
+    
+    async def quiz_fetch(client, index):
+        quiz_id = str(quizzes[index % len(quizzes)]["_id"])
+        return await client.get(f"/api/quizzes/{quiz_id}", headers=auth(index))
+    
+    async def quiz_submit(client, index):
+        quiz = quizzes[index % len(quizzes)]
+        quiz_id = str(quiz["_id"])
+        answers = [index % 4] * quiz.get("question_count", 0)
+        return await client.post(
+            f"/api/quizzes/{quiz_id}/attempt",
+            json={"quiz_id": quiz_id, "answers": answers},
+            headers=auth(index)
+        )
+    
+    async def dashboard(client, index):
+        return await client.get("/api/dashboard", headers=auth(index))
+    
+    requests = args.requests
+    scenarios = [
+        ("register_storm", register, args.users),
+        ("login_storm", login, args.users),
+        ("catalog_browse", browse_catalog, requests),
+        ("course_detail", course_detail, requests),
+        ("enroll", enroll, min(args.users * len(course_ids), requests)),
+        ("quiz_fetch", quiz_fetch, requests),
+        ("quiz_submit", quiz_submit, requests),
+        ("dashboard_poll", dashboard, requests),
+    ]
+    
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, make_request, total in scenarios:
+            results[name] = await run_scenario(name, client, make_request, total, args.concurrency)
+            if name == "login_storm" and not args.mongodb_uri:
+                await prebuild_user_stats(db, emails)
+    
+    if args.mongodb_uri:
+        await main.shutdown_db_client()
+    
+    return {
+        "commit": _git_commit(),
+        "backend": "mongod" if args.mongodb_uri else "in-memory",
+        "users": args.users,
+        "concurrency": args.concurrency,
+        "requests_per_scenario": requests,
+        "started_at": run_id,
+        "scenarios": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LearnHub API end to end")
+    parser.add_argument("--mongodb-uri", help="Use this mongod instead of the in-memory stand-in")
+    parser.add_argument("--users", type=int, default=50, help="Users registered and logged in")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per read/write scenario")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent clients")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+    
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Compares the Pydantic response path with the fast serialization path.
+
+Usage: python bench_serialization.py [--courses 100] [--rounds 200]
+"""
+from bson import ObjectId
+from pydantic import TypeAdapter
+from typing import List
+from models import CourseResponse
+from seed_data import DUMMY_COURSES
+from serialization import dumps, documents_to_dicts
+import argparse
+import copy
+import json
+import time
+
+def build_documents(count: int) -> list:
+    """Course documents shaped as they come back from Mongo"""
+    documents = []
+    for i in range(count):
+        document = copy.deepcopy(DUMMY_COURSES[i % len(DUMMY_COURSES)])
+        document["_id"] = ObjectId()
+        documents.append(document)
+    return documents
+
+def pydantic_path(documents: list, adapter: TypeAdapter) -> bytes:
+    """What get_courses used to do: build models, then validate and dump again"""
+    models = [
+        CourseResponse(
+            id=str(course["_id"]),
+            **{k: v for k, v in course.items() if k != "_id"}
+        )
+        for course in documents
+    ]
+    return adapter.dump_json(adapter.validate_python([m.model_dump() for m in models]))
+
+def fast_path(documents: list) -> bytes:
+    return dumps(documents_to_dicts(CourseResponse, documents))
+
+def _time(func, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - started) / rounds
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark course list serialization")
+    parser.add_argument("--courses", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+    
+    documents = build_documents(args.courses)
+    adapter = TypeAdapter(List[CourseResponse])
+    assert json.loads(pydantic_path(documents, adapter)) == json.loads(fast_path(documents))
+    
+    pydantic_seconds = _time(lambda: pydantic_path(documents, adapter), args.rounds)
+    fast_seconds = _time(lambda: fast_path(documents), args.rounds)
+    
+    print(json.dumps({
+        "courses": args.courses,
+        "rounds": args.rounds,
+        "pydantic_us_per_item": round(pydantic_seconds / args.courses * 1e6, 2),
+        "fast_us_per_item": round(fast_seconds / args.courses * 1e6, 2),
+        "saved_us_per_item": round((pydantic_seconds - fast_seconds) / args.courses * 1e6, 2),
+        "speedup": round(pydantic_seconds / fast_seconds, 1),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+from fastapi import Request, Response
+from cache import LRUTTLCache
+from config import settings
+import hashlib
+
+class CatalogEntry:
+    """Serialized response body with its content hash"""
+    
+    __slots__ = ("body", "etag", "headers")
+    
+    def __init__(self, body: bytes, headers: dict = None):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.headers = headers or {}
+
+# Keyed by (route, query string); cleared whenever a course is written
+catalog_cache = LRUTTLCache(
+    maxsize=settings.catalog_cache_size,
+    ttl=settings.catalog_cache_ttl_seconds
+)
+
+def get_catalog_entry(key) -> CatalogEntry:
+    return catalog_cache.get(key)
+
+def store_catalog_entry(key, body: bytes, headers: dict = None) -> CatalogEntry:
+    entry = CatalogEntry(body, headers)
+    catalog_cache.set(key, entry)
+    return entry
+
+def invalidate_catalog_cache():
+    """Drop every cached catalog response after a course write"""
+    catalog_cache.clear()
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+def catalog_response(request: Request, entry: CatalogEntry) -> Response:
+    """Serve a cached entry with ETag/Cache-Control, answering If-None-Match with 304"""
+    headers = {
+        **entry.headers,
+        "ETag": entry.etag,
+        "Cache-Control": f"public, max-age={settings.catalog_cache_max_age_seconds}",
+    }
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers=headers)
+    
+    return Response(content=entry.body, media_type="application/json", headers=headers)
@@ -7,6 +7,31 @@ class Settings(BaseSettings):
     jwt_algorithm: str = "HS256"
     jwt_expiration_minutes: int = 10080  # 7 days
     frontend_url: str = "http://localhost:3000"
+    admin_emails: str = ""  # comma-separated; these users may enroll others in bulk
+    mongo_max_pool_size: int = 100
+    mongo_min_pool_size: int = 10  # connections opened before the app reports ready
+    mongo_wait_queue_timeout_ms: Optional[int] = None
+    mongo_compressors: str = ""  # e.g. "zstd,snappy,zlib"; zstd/snappy need zstandard/python-snappy installed
+    mongo_zlib_compression_level: int = -1
+    web_concurrency: Optional[int] = None  # uvicorn workers for serve.py; defaults to CPU count
+    startup_lease_ttl_seconds: float = 60.0
+    query_budget_mode: str = "off"  # "off", "warn" or "raise" (dev/test)
+    query_budget_default: int = 10  # Mongo commands per request unless a route sets its own
+    query_repeat_threshold: int = 3  # same query shape this many times in one request is flagged
+    seed_on_startup: bool = True  # seed the demo catalog on boot if it has never been seeded
+    password_hash_executor: str = "thread"  # "thread" or "process"
+    password_hash_workers: int = 4
+    password_hash_max_queue: int = 64  # pending hash/verify jobs before rejecting
+    user_cache_size: int = 10000
+    user_cache_ttl_seconds: float = 30.0  # per worker; bounds how stale other workers can be after a user update
+    answer_key_cache_size: int = 2000
+    answer_key_cache_ttl_seconds: float = 3600.0
+    catalog_cache_size: int = 512
+    catalog_cache_ttl_seconds: float = 60.0
+    catalog_cache_max_age_seconds: int = 60  # Cache-Control max-age sent to clients
+    progress_buffer_max_entries: int = 10000  # buffered lesson positions before a forced flush
+    progress_flush_interval_seconds: float = 5.0
+    progress_flush_batch_size: int = 1000
     
     class Config:
         env_file = ".env"
@@ -1,6 +1,12 @@
 from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo import ASCENDING, DESCENDING
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
 from config import settings
+from query_budget import query_recorder_listener
+from db_monitoring import pool_stats_listener, command_metrics_listener, get_pool_stats
+from datetime import datetime
+import asyncio
+import hashlib
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -8,84 +14,218 @@ logger = logging.getLogger(__name__)
 class Database:
     client: AsyncIOMotorClient = None
     db = None
+    index_build_task: asyncio.Task = None
 
 db = Database()
 
+# Declarative index spec; startup compares its fingerprint with the
+# marker in app_meta and only builds indexes when the spec changed.
+# Keep it free of prefix-redundant indexes (index_advisor.redundant_indexes)
+INDEX_SPEC = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True),
+    ],
+    "profiles": [
+        IndexModel([("user_id", ASCENDING)], unique=True),
+    ],
+    "courses": [
+        IndexModel([("title", ASCENDING)]),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("category", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel(
+            [("title", TEXT), ("description", TEXT), ("category", TEXT), ("lessons.title", TEXT), ("lessons.description", TEXT)],
+            weights={"title": 10, "category": 5, "description": 3, "lessons.title": 2, "lessons.description": 1},
+            name="course_text"
+        ),
+    ],
+    "enrollments": [
+        IndexModel([("user_id", ASCENDING), ("course_id", ASCENDING)], unique=True),
+        IndexModel([("course_id", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("enrolled_at", DESCENDING)]),
+    ],
+    "quizzes": [
+        IndexModel([("course_id", ASCENDING)]),
+    ],
+    "quiz_questions": [
+        IndexModel([("quiz_id", ASCENDING)]),
+    ],
+    "quiz_results": [
+        IndexModel([("user_id", ASCENDING), ("quiz_id", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("attempted_at", DESCENDING), ("_id", DESCENDING)]),
+    ],
+}
+
+INDEX_MARKER_ID = "indexes"
+
+def index_spec_version() -> str:
+    """Fingerprint of INDEX_SPEC, stored once the indexes have been built"""
+    spec = {
+        collection: sorted(json.dumps(model.document, sort_keys=True, default=str) for model in models)
+        for collection, models in INDEX_SPEC.items()
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()
+
 async def connect_to_mongo():
-    """Connect to MongoDB and create collections if they don't exist"""
+    """Connect to MongoDB and warm up the connection pool"""
     try:
         logger.info("Connecting to MongoDB...")
-        db.client = AsyncIOMotorClient(settings.mongodb_uri)
+        client_options = {
+            "maxPoolSize": settings.mongo_max_pool_size,
+            "minPoolSize": settings.mongo_min_pool_size,
+            "event_listeners": [pool_stats_listener, command_metrics_listener],
+        }
+        if settings.query_budget_mode != "off":
+            client_options["event_listeners"].append(query_recorder_listener)
+        if settings.mongo_wait_queue_timeout_ms is not None:
+            client_options["waitQueueTimeoutMS"] = settings.mongo_wait_queue_timeout_ms
+        if settings.mongo_compressors:
+            client_options["compressors"] = settings.mongo_compressors
+            client_options["zlibCompressionLevel"] = settings.mongo_zlib_compression_level
+        
+        db.client = AsyncIOMotorClient(settings.mongodb_uri, **client_options)
         db.db = db.client.get_database()
         
         # Test connection
         await db.client.admin.command('ping')
         logger.info("Successfully connected to MongoDB!")
         
-        # Create collections and indexes
-        await create_collections()
-        logger.info("Collections and indexes created successfully!")
+        await prewarm_pool(settings.mongo_min_pool_size)
         
     except Exception as e:
         logger.error(f"Error connecting to MongoDB: {e}")
         raise
 
+async def prewarm_pool(connections: int):
+    """Open pool connections up front with concurrent pings"""
+    if connections <= 1:
+        return
+    await asyncio.gather(*(db.client.admin.command('ping') for _ in range(connections)))
+    logger.info(f"Connection pool warmed: {get_pool_stats()['open_connections']} connections open")
+
 async def close_mongo_connection():
     """Close MongoDB connection"""
+    if db.index_build_task and not db.index_build_task.done():
+        db.index_build_task.cancel()
     if db.client:
         db.client.close()
         logger.info("MongoDB connection closed")
 
-async def create_collections():
-    """Create all required collections and indexes"""
-    
-    # Get existing collections
-    existing_collections = await db.db.list_collection_names()
-    
-    # Define collections to create
-    collections = [
-        "users",
-        "profiles", 
-        "courses",
-        "enrollments",
-        "quizzes",
-        "quiz_questions",
-        "quiz_results"
+# Index options that change behaviour; anything else the server reports is ignored
+COMPARED_INDEX_OPTIONS = (
+    "unique", "sparse", "partialFilterExpression", "expireAfterSeconds",
+    "weights", "default_language", "language_override", "collation"
+)
+
+def _normalize(value):
+    """Plain dicts and ints so server-reported and spec values compare equal"""
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def _index_signature(index: dict) -> dict:
+    """Key and options of a spec index document or a list_indexes entry"""
+    # Text indexes are reported as _fts/_ftsx; their fields live in weights
+    key = [
+        (field, _normalize(direction)) for field, direction in index["key"].items()
+        if field not in ("_fts", "_ftsx")
     ]
+    text_fields = [field for field, direction in key if direction == TEXT]
+    signature = {
+        "key": [(field, direction) for field, direction in key if direction != TEXT],
+        "unique": bool(index.get("unique", False)),
+        "sparse": bool(index.get("sparse", False)),
+    }
+    for option in COMPARED_INDEX_OPTIONS[2:]:
+        if option in index:
+            signature[option] = _normalize(index[option])
+    if text_fields:
+        signature["weights"] = {field: 1 for field in text_fields} | signature.get("weights", {})
+    return signature
+
+def _index_matches(spec: dict, existing: dict) -> bool:
+    spec_signature = _index_signature(spec)
+    existing_signature = _index_signature(existing)
+    # Server defaults (e.g. default_language) only matter when the spec sets them
+    return all(existing_signature.get(option) == value for option, value in spec_signature.items())
+
+async def _build_missing_indexes(collection_name: str, models: list) -> tuple:
+    """Create missing spec indexes and recreate ones whose key or options drifted.
     
-    # Create collections if they don't exist
-    for collection_name in collections:
-        if collection_name not in existing_collections:
-            await db.db.create_collection(collection_name)
-            logger.info(f"Created collection: {collection_name}")
-    
-    # Create indexes
-    # Users collection
-    await db.db.users.create_index([("email", ASCENDING)], unique=True)
-    
-    # Profiles collection
-    await db.db.profiles.create_index([("user_id", ASCENDING)], unique=True)
-    
-    # Courses collection
-    await db.db.courses.create_index([("title", ASCENDING)])
-    await db.db.courses.create_index([("created_at", DESCENDING)])
-    
-    # Enrollments collection
-    await db.db.enrollments.create_index([("user_id", ASCENDING), ("course_id", ASCENDING)], unique=True)
-    await db.db.enrollments.create_index([("user_id", ASCENDING)])
-    await db.db.enrollments.create_index([("course_id", ASCENDING)])
+    Returns (indexes created, drifted indexes left for manual action).
+    """
+    collection = db.db[collection_name]
+    existing = {index["name"]: index async for index in collection.list_indexes()}
     
-    # Quizzes collection
-    await db.db.quizzes.create_index([("course_id", ASCENDING)])
+    missing = []
+    manual = []
+    for model in models:
+        spec = model.document
+        current = existing.get(spec["name"])
+        if current is None:
+            missing.append(model)
+        elif _index_matches(spec, current):
+            continue
+        elif spec.get("unique") or current.get("unique"):
+            # Dropping would leave a window without uniqueness, and routes such as
+            # enroll_course rely on it alone to reject duplicates. MongoDB also
+            # refuses a second index on the same key differing only in unique,
+            # so it cannot be built alongside under another name either.
+            logger.error(
+                f"Unique index {collection_name}.{spec['name']} differs from the spec; "
+                f"it was left in place, rebuild it manually during a quiet period"
+            )
+            manual.append(f"{collection_name}.{spec['name']}")
+        else:
+            logger.warning(f"Index {collection_name}.{spec['name']} differs from the spec, recreating it")
+            await collection.drop_index(spec["name"])
+            missing.append(model)
     
-    # Quiz questions collection
-    await db.db.quiz_questions.create_index([("quiz_id", ASCENDING)])
+    spec_names = {model.document["name"] for model in models}
+    for name in existing.keys() - spec_names - {"_id_"}:
+        logger.warning(f"Index {collection_name}.{name} is not in INDEX_SPEC; drop it if it is no longer needed")
     
-    # Quiz results collection
-    await db.db.quiz_results.create_index([("user_id", ASCENDING), ("quiz_id", ASCENDING)])
-    await db.db.quiz_results.create_index([("user_id", ASCENDING)])
+    if missing:
+        await collection.create_indexes(missing)
+        logger.info(f"Created {len(missing)} indexes on {collection_name}")
+    return len(missing), manual
+
+async def build_indexes(version: str):
+    """Build missing indexes for every collection concurrently, then store the marker"""
+    try:
+        outcomes = await asyncio.gather(*(
+            _build_missing_indexes(collection_name, models)
+            for collection_name, models in INDEX_SPEC.items()
+        ))
+        created = sum(count for count, _ in outcomes)
+        manual = [name for _, names in outcomes for name in names]
+        if manual:
+            # No marker, so every startup reports them until they are fixed
+            logger.error(f"Index reconciliation incomplete, {created} indexes created; needs manual action: {', '.join(manual)}")
+            return
+        await db.db.app_meta.update_one(
+            {"_id": INDEX_MARKER_ID},
+            {"$set": {"version": version, "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+        logger.info(f"Index reconciliation finished, {created} indexes created or rebuilt")
+    except Exception as e:
+        logger.error(f"Index reconciliation failed: {e}")
+        raise
+
+async def reconcile_indexes(wait: bool = False):
+    """Return immediately when the stored index version matches INDEX_SPEC"""
+    version = index_spec_version()
+    marker = await db.db.app_meta.find_one({"_id": INDEX_MARKER_ID})
+    if marker and marker.get("version") == version:
+        logger.info("Indexes up to date")
+        return
     
-    logger.info("Indexes created successfully!")
+    logger.info("Index spec changed, reconciling indexes in the background")
+    db.index_build_task = asyncio.create_task(build_indexes(version))
+    if wait:
+        await db.index_build_task
 
 def get_database():
     return db.db
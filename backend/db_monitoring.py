@@ -0,0 +1,115 @@
+from pymongo import monitoring
+from metrics import MONGO_COMMANDS, MONGO_COMMAND_LATENCY
+import threading
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Tracks connection pool usage from pymongo's pool events"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open_connections = 0
+        self.checked_out = 0
+        self.waiters = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.pool_clears = 0
+    
+    def pool_created(self, event):
+        pass
+    
+    def pool_ready(self, event):
+        pass
+    
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+    
+    def pool_closed(self, event):
+        pass
+    
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+    
+    def connection_ready(self, event):
+        pass
+    
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+    
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self.waiters += 1
+    
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.waiters -= 1
+            self.checkout_failures += 1
+    
+    def connection_checked_out(self, event):
+        # event.duration is the time spent waiting for the connection
+        wait_seconds = getattr(event, "duration", 0.0) or 0.0
+        with self._lock:
+            self.waiters -= 1
+            self.checked_out += 1
+            self.checkouts += 1
+            self.wait_seconds_total += wait_seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+    
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+    
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "open_connections": self.open_connections,
+                "checked_out": self.checked_out,
+                "waiters": self.waiters,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+                "wait_seconds_avg": self.wait_seconds_total / self.checkouts if self.checkouts else 0.0,
+                "pool_clears": self.pool_clears,
+            }
+
+pool_stats_listener = PoolStatsListener()
+
+def get_pool_stats() -> dict:
+    return pool_stats_listener.snapshot()
+
+def command_collection(command_name: str, command: dict) -> str:
+    """Collection a command targets, or "-" for database/admin commands"""
+    if command_name == "getMore":
+        return command.get("collection", "-")
+    target = command.get(command_name)
+    return target if isinstance(target, str) else "-"
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """Counts and times Mongo commands per collection and command name"""
+    
+    def __init__(self):
+        self._collections = {}
+    
+    def started(self, event):
+        # Succeeded/failed events don't carry the command body, so remember the collection
+        self._collections[(event.request_id, event.connection_id)] = command_collection(
+            event.command_name, event.command
+        )
+    
+    def _finish(self, event, outcome: str):
+        collection = self._collections.pop((event.request_id, event.connection_id), "-")
+        MONGO_COMMANDS.inc(collection, event.command_name, outcome)
+        MONGO_COMMAND_LATENCY.observe(collection, event.command_name, value=event.duration_micros / 1e6)
+    
+    def succeeded(self, event):
+        self._finish(event, "success")
+    
+    def failed(self, event):
+        self._finish(event, "failure")
+
+command_metrics_listener = CommandMetricsListener()
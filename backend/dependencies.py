@@ -2,38 +2,68 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from auth import verify_token
 from database import get_database
+from cache import LRUTTLCache
+from config import settings
 from bson import ObjectId
 
 security = HTTPBearer()
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db = Depends(get_database)
-):
-    """Get current authenticated user"""
-    token = credentials.credentials
-    payload = verify_token(token)
-    
+# Authenticated user documents keyed by user id. The cache is per process:
+# invalidate_user_cache only reaches the worker that handled the write, so
+# routes that show users their own mutable fields read fresh instead
+user_cache = LRUTTLCache(maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl_seconds)
+
+ADMIN_EMAILS = {email.strip().lower() for email in settings.admin_emails.split(",") if email.strip()}
+
+def is_admin(user) -> bool:
+    return user.get("email", "").lower() in ADMIN_EMAILS
+
+def invalidate_user_cache(user_id: str):
+    """Drop this worker's cached user document after a write"""
+    user_cache.invalidate(str(user_id))
+
+def _token_user_id(credentials: HTTPAuthorizationCredentials) -> str:
+    payload = verify_token(credentials.credentials)
     user_id = payload.get("sub")
-    if user_id is None:
+    if user_id is None or not ObjectId.is_valid(user_id):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials"
         )
-    
+    return user_id
+
+async def _load_user(db, user_id: str):
     user = await db.users.find_one({"_id": ObjectId(user_id)})
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found"
         )
-    
+    user_cache.set(user_id, user)
+    return user
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db = Depends(get_database)
+):
+    """Get current authenticated user"""
+    user_id = _token_user_id(credentials)
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await _load_user(db, user_id)
     return user
 
+async def get_current_user_fresh(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db = Depends(get_database)
+):
+    """Get current authenticated user, bypassing the cache (e.g. profile_completed)"""
+    return await _load_user(db, _token_user_id(credentials))
+
 async def get_current_user_profile(
     user = Depends(get_current_user),
     db = Depends(get_database)
 ):
     """Get current user's profile"""
-    profile = await db.profiles.find_one({"user_id": str(user["_id"])})
-    return profile
+    # Not cached: another worker may have just created or updated it
+    return await db.profiles.find_one({"user_id": str(user["_id"])})
@@ -0,0 +1,175 @@
+"""Explain-based index advisor.
+
+QUERY_SHAPES registers the query shapes the API routes issue. The advisor
+runs ``explain`` on each against a (seeded) database, flags collection
+scans and in-memory SORT stages, and proposes an equality-sort-range
+index for each. Aggregations are registered by their leading $match/$sort,
+which is what the server pushes down to the query planner.
+
+Usage:
+    python index_advisor.py           # report
+    python index_advisor.py --apply   # also create the proposed indexes
+"""
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+import argparse
+import asyncio
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# (route, collection, filter(samples) -> dict, sort)
+QUERY_SHAPES = [
+    ("POST /api/auth/register, /api/auth/login", "users", lambda s: {"email": s["email"]}, None),
+    ("auth dependency", "users", lambda s: {"_id": s["user_oid"]}, None),
+    ("GET /api/profile", "profiles", lambda s: {"user_id": s["user_id"]}, None),
+    ("GET /api/courses", "courses", lambda s: {}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("GET /api/courses?category=", "courses", lambda s: {"category": s["category"]}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("GET /api/courses/search", "courses", lambda s: {"$text": {"$search": s["category"]}}, None),
+    ("GET /api/courses/{course_id}", "courses", lambda s: {"_id": s["course_oid"]}, None),
+    ("POST /api/enrollments", "enrollments", lambda s: {"user_id": s["user_id"], "course_id": s["course_id"]}, None),
+    ("GET /api/enrollments", "enrollments", lambda s: {"user_id": s["user_id"]}, None),
+    ("user_stats rebuild (recent enrollments)", "enrollments", lambda s: {"user_id": s["user_id"]}, [("enrolled_at", DESCENDING)]),
+    ("GET /api/quizzes/course/{course_id}", "quizzes", lambda s: {"course_id": s["course_id"]}, None),
+    ("GET /api/quizzes/{quiz_id}", "quizzes", lambda s: {"_id": s["quiz_oid"]}, None),
+    ("GET /api/quizzes/{quiz_id}", "quiz_questions", lambda s: {"quiz_id": s["quiz_id"]}, None),
+    ("POST /api/quizzes/attempts/batch", "quiz_questions", lambda s: {"quiz_id": {"$in": [s["quiz_id"]]}}, None),
+    ("GET /api/quizzes/results[/history|/export]", "quiz_results", lambda s: {"user_id": s["user_id"]}, [("attempted_at", DESCENDING), ("_id", DESCENDING)]),
+    ("user_stats rebuild (recent results)", "quiz_results", lambda s: {"user_id": s["user_id"]}, [("attempted_at", DESCENDING)]),
+    ("GET /api/dashboard", "user_stats", lambda s: {"_id": s["user_id"]}, None),
+]
+
+async def gather_samples(db) -> dict:
+    """Realistic filter values taken from the database, with placeholders as fallback"""
+    user = await db.users.find_one({}, {"email": 1}) or {"_id": ObjectId(), "email": "nobody@example.com"}
+    course = await db.courses.find_one({}, {"category": 1}) or {"_id": ObjectId(), "category": "General"}
+    quiz = await db.quizzes.find_one({}, {"_id": 1}) or {"_id": ObjectId()}
+    return {
+        "email": user["email"],
+        "user_oid": user["_id"],
+        "user_id": str(user["_id"]),
+        "course_oid": course["_id"],
+        "course_id": str(course["_id"]),
+        "category": course.get("category", "General"),
+        "quiz_oid": quiz["_id"],
+        "quiz_id": str(quiz["_id"]),
+    }
+
+def plan_stages(explain: dict) -> list:
+    """Every stage name in the winning plan(s) of an explain document"""
+    stages = []
+    
+    def walk(node, in_plan):
+        if isinstance(node, dict):
+            if in_plan and "stage" in node:
+                stages.append(node["stage"])
+            for key, value in node.items():
+                walk(value, in_plan or key == "winningPlan")
+        elif isinstance(node, list):
+            for item in node:
+                walk(item, in_plan)
+    
+    walk(explain, False)
+    return stages
+
+def suggest_index(query: dict, sort: list) -> list:
+    """Equality fields, then sort fields, then range fields"""
+    equality = []
+    ranges = []
+    for field, value in query.items():
+        if field.startswith("$"):
+            continue
+        if isinstance(value, dict) and any(k.startswith("$") and k != "$in" for k in value):
+            ranges.append((field, ASCENDING))
+        else:
+            equality.append((field, ASCENDING))
+    
+    keys = equality + list(sort or [])
+    keys += [r for r in ranges if r[0] not in {k for k, _ in keys}]
+    return keys
+
+def _is_prefix(keys: list, existing: list) -> bool:
+    return list(existing[:len(keys)]) == list(keys)
+
+async def analyze(db, apply: bool = False) -> list:
+    """Explain every registered shape and report (optionally build) missing indexes"""
+    samples = await gather_samples(db)
+    report = []
+    
+    for route, collection, build_filter, sort in QUERY_SHAPES:
+        query = build_filter(samples)
+        command = {"find": collection, "filter": query, "limit": 20}
+        if sort:
+            command["sort"] = dict(sort)
+        
+        explain = await db.command("explain", command, verbosity="queryPlanner")
+        stages = plan_stages(explain)
+        problems = [stage for stage in ("COLLSCAN", "SORT") if stage in stages]
+        
+        entry = {
+            "route": route,
+            "collection": collection,
+            "filter": sorted(query),
+            "sort": [field for field, _ in sort or []],
+            "stages": stages,
+            "problems": problems,
+        }
+        
+        if problems and query.keys() != {"_id"}:
+            proposal = suggest_index(query, sort)
+            existing = [
+                list(index["key"].items())
+                async for index in db[collection].list_indexes()
+            ]
+            if proposal and not any(_is_prefix(proposal, keys) for keys in existing):
+                entry["proposed_index"] = proposal
+                if apply:
+                    entry["created_index"] = await db[collection].create_index(proposal)
+        
+        report.append(entry)
+    
+    return report
+
+def redundant_indexes(index_spec: dict) -> list:
+    """Spec indexes whose keys are a strict prefix of another index on the same collection"""
+    redundant = []
+    for collection, models in index_spec.items():
+        keys = [(list(m.document["key"].items()), m.document) for m in models]
+        for short, short_doc in keys:
+            if short_doc.get("unique"):
+                continue
+            for long, _ in keys:
+                if len(long) > len(short) and _is_prefix(short, long):
+                    redundant.append({"collection": collection, "index": short_doc["name"]})
+                    break
+    return redundant
+
+async def _main(args):
+    from database import connect_to_mongo, close_mongo_connection, get_database, INDEX_SPEC
+    
+    await connect_to_mongo()
+    try:
+        report = await analyze(get_database(), apply=args.apply)
+    finally:
+        await close_mongo_connection()
+    
+    if args.json:
+        print(json.dumps({"shapes": report, "redundant": redundant_indexes(INDEX_SPEC)}, indent=2, default=str))
+        return
+    
+    for entry in report:
+        status = ", ".join(entry["problems"]) or "ok"
+        print(f"[{status:>14}] {entry['collection']:<15} {entry['route']}  stages={'>'.join(entry['stages'])}")
+        if "proposed_index" in entry:
+            action = "created" if "created_index" in entry else "proposed"
+            print(f"{'':17}{action}: {entry['collection']}.create_index({entry['proposed_index']})")
+    for item in redundant_indexes(INDEX_SPEC):
+        print(f"[     redundant] {item['collection']:<15} {item['index']} is a prefix of a compound index")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description="Explain every route query shape and propose missing indexes")
+    parser.add_argument("--apply", action="store_true", help="Create the proposed indexes")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,113 @@
+"""In-memory stand-in for the Motor database object, for benchmarks.
+
+Wraps mongomock (``pip install -r requirements-bench.txt``) behind Motor's
+async API. It covers the operations the API routes use but not every
+aggregation operator ($convert, computed find projections), so it is
+meant for relative comparisons between commits, not for correctness.
+Every call is counted in metrics.MONGO_COMMANDS like a real command.
+"""
+from metrics import MONGO_COMMANDS, MONGO_COMMAND_LATENCY
+import time
+
+try:
+    import mongomock
+except ImportError:  # pragma: no cover - optional benchmark dependency
+    mongomock = None
+
+def _record(collection: str, command: str, started: float):
+    MONGO_COMMANDS.inc(collection, command, "success")
+    MONGO_COMMAND_LATENCY.observe(collection, command, value=time.perf_counter() - started)
+
+class InMemoryCursor:
+    """Motor-style cursor over a mongomock cursor or a materialized result"""
+    
+    def __init__(self, collection: str, command: str, cursor):
+        self._collection = collection
+        self._command = command
+        self._cursor = cursor
+        self._iterator = None
+    
+    def sort(self, *args, **kwargs):
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+    
+    def skip(self, count: int):
+        self._cursor = self._cursor.skip(count)
+        return self
+    
+    def limit(self, count: int):
+        self._cursor = self._cursor.limit(count)
+        return self
+    
+    def batch_size(self, size: int):
+        return self
+    
+    async def to_list(self, length=None):
+        started = time.perf_counter()
+        documents = list(self._cursor)
+        _record(self._collection, self._command, started)
+        return documents if length is None else documents[:length]
+    
+    def __aiter__(self):
+        return self
+    
+    async def __anext__(self):
+        if self._iterator is None:
+            started = time.perf_counter()
+            self._iterator = iter(list(self._cursor))
+            _record(self._collection, self._command, started)
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+class InMemoryCollection:
+    def __init__(self, collection):
+        self._collection = collection
+        self.name = collection.name
+    
+    def find(self, *args, **kwargs):
+        return InMemoryCursor(self.name, "find", self._collection.find(*args, **kwargs))
+    
+    def aggregate(self, pipeline, **kwargs):
+        return InMemoryCursor(self.name, "aggregate", iter(list(self._collection.aggregate(pipeline))))
+    
+    def list_indexes(self):
+        return InMemoryCursor(self.name, "listIndexes", iter(self._collection.list_indexes()))
+    
+    def __getattr__(self, name: str):
+        attribute = getattr(self._collection, name)
+        if not callable(attribute):
+            return attribute
+        
+        async def call(*args, **kwargs):
+            kwargs.pop("session", None)
+            started = time.perf_counter()
+            result = attribute(*args, **kwargs)
+            _record(self.name, name, started)
+            return result
+        return call
+
+class InMemoryDatabase:
+    """Drop-in for the object returned by database.get_database()"""
+    
+    def __init__(self, name: str = "lms_bench"):
+        if mongomock is None:
+            raise RuntimeError("The in-memory database needs mongomock: pip install -r requirements-bench.txt")
+        self._database = mongomock.MongoClient().get_database(name)
+        self._collections = {}
+    
+    def __getitem__(self, name: str) -> InMemoryCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = InMemoryCollection(self._database[name])
+            self._collections[name] = collection
+        return collection
+    
+    def __getattr__(self, name: str) -> InMemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+    
+    async def list_collection_names(self):
+        return self._database.list_collection_names()
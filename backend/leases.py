@@ -0,0 +1,77 @@
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import os
+import socket
+import uuid
+
+logger = logging.getLogger(__name__)
+
+def _lease_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+async def acquire_lease(db, name: str, owner: str, ttl_seconds: float) -> bool:
+    """Take the named lease if it is free or expired"""
+    now = datetime.utcnow()
+    try:
+        await db.leases.update_one(
+            {"_id": name, "expires_at": {"$lt": now}},
+            {
+                "$set": {"owner": owner, "acquired_at": now, "expires_at": now + timedelta(seconds=ttl_seconds)},
+                "$unset": {"completed_at": ""}
+            },
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        # Someone else holds an unexpired lease, so the upsert collided with it
+        return False
+
+async def _renew_lease(db, name: str, owner: str, ttl_seconds: float):
+    while True:
+        await asyncio.sleep(ttl_seconds / 3)
+        await db.leases.update_one(
+            {"_id": name, "owner": owner},
+            {"$set": {"expires_at": datetime.utcnow() + timedelta(seconds=ttl_seconds)}}
+        )
+
+async def release_lease(db, name: str, owner: str, completed: bool = False):
+    """Give up the lease, recording whether the leader's work completed"""
+    if completed:
+        await db.leases.update_one(
+            {"_id": name, "owner": owner},
+            {"$set": {"expires_at": datetime.utcnow(), "completed_at": datetime.utcnow()}}
+        )
+    else:
+        await db.leases.delete_one({"_id": name, "owner": owner})
+
+async def run_with_lease(db, name: str, func, ttl_seconds: float = 60.0, poll_seconds: float = 0.5) -> bool:
+    """Run func in exactly one process; processes that lose the race wait for it.
+    
+    When the leader completes, the waiting processes return without running
+    func. If the leader fails or its lease expires, a waiter takes over.
+    Returns True if this process ran func.
+    """
+    owner = _lease_owner()
+    while True:
+        if await acquire_lease(db, name, owner, ttl_seconds):
+            renewer = asyncio.create_task(_renew_lease(db, name, owner, ttl_seconds))
+            completed = False
+            try:
+                await func()
+                completed = True
+            finally:
+                renewer.cancel()
+                await release_lease(db, name, owner, completed=completed)
+            return True
+        
+        lease = await db.leases.find_one({"_id": name})
+        leader = lease["owner"] if lease else None
+        logger.info(f"Waiting for {leader} to finish '{name}'...")
+        while lease and lease["owner"] == leader and lease["expires_at"] >= datetime.utcnow():
+            await asyncio.sleep(poll_seconds)
+            lease = await db.leases.find_one({"_id": name})
+        
+        if lease and lease["owner"] == leader and lease.get("completed_at"):
+            return False
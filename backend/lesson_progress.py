@@ -0,0 +1,131 @@
+"""Per-lesson completion tracking on enrollment documents.
+
+Completed lessons are stored as a bitmap in ``completed_lessons``, an array
+of Int64 words (lesson ``i`` is bit ``i % 64`` of word ``i // 64``), so any
+number of lessons can be tracked. ``completed_lesson_count``, ``progress``
+(percent) and ``completed`` are derived in the same pipeline update. The filter only matches when the
+lesson's bit is in the expected state, so each event is one atomic write
+with no read-modify-write, and repeated events are no-ops.
+"""
+from bson import ObjectId, Int64
+from pymongo import ReturnDocument
+from cache import LRUTTLCache
+from config import settings
+
+WORD_BITS = 64
+
+# course_id -> number of lessons; courses are only written by seeding, so a TTL suffices
+lesson_count_cache = LRUTTLCache(maxsize=settings.catalog_cache_size, ttl=settings.catalog_cache_ttl_seconds)
+
+class LessonOutOfRange(ValueError):
+    pass
+
+async def get_lesson_count(db, course_id: str):
+    """Lesson count of a course, or None if it does not exist"""
+    count = lesson_count_cache.get(course_id)
+    if count is None:
+        course = await db.courses.find_one(
+            {"_id": ObjectId(course_id)},
+            {"lesson_count": {"$size": {"$ifNull": ["$lessons", []]}}}
+        )
+        if course is None:
+            return None
+        count = course["lesson_count"]
+        lesson_count_cache.set(course_id, count)
+    return count
+
+def lesson_indexes(words: list) -> list:
+    """Completed lesson indexes from a stored bitmap"""
+    return [
+        word_index * WORD_BITS + bit
+        for word_index, word in enumerate(words or [])
+        for bit in range(WORD_BITS)
+        if word >> bit & 1
+    ]
+
+def _bit_value(bit: int) -> Int64:
+    """Signed Int64 whose two's-complement representation has only this bit set"""
+    value = 1 << bit
+    return Int64(value - (1 << WORD_BITS) if bit == WORD_BITS - 1 else value)
+
+def _update_word(word_index: int, operator: str, value: Int64) -> dict:
+    """Expression for the bitmap with one word ``$add``-ed or ``$subtract``-ed by ``value``, padding with zero words"""
+    words = {"$ifNull": ["$completed_lessons", []]}
+    return {"$let": {
+        "vars": {"padded": {"$concatArrays": [
+            words,
+            {"$map": {"input": {"$range": [{"$size": words}, word_index + 1]}, "in": Int64(0)}}
+        ]}},
+        "in": {"$map": {
+            "input": {"$range": [0, {"$size": "$$padded"}]},
+            "as": "i",
+            "in": {"$cond": [
+                {"$eq": ["$$i", word_index]},
+                {operator: [{"$arrayElemAt": ["$$padded", "$$i"]}, value]},
+                {"$arrayElemAt": ["$$padded", "$$i"]}
+            ]}
+        }}
+    }}
+
+def _derive_progress(lesson_count: int) -> dict:
+    """Pipeline stage recomputing progress and completed from the counters"""
+    return {"$set": {
+        "progress": {"$round": [
+            {"$multiply": [{"$divide": ["$completed_lesson_count", max(lesson_count, 1)]}, 100]}, 2
+        ]},
+        "completed": {"$gte": ["$completed_lesson_count", lesson_count]}
+    }}
+
+async def set_lesson_completed(db, user_id: str, course_id: str, lesson_index: int, lesson_count: int, completed: bool):
+    """Set or clear one lesson's bit.
+    
+    Returns (enrollment_after, course_completion_delta), or (None, 0) when
+    the enrollment is missing or the bit was already in the requested state.
+    """
+    if not 0 <= lesson_index < lesson_count:
+        raise LessonOutOfRange(lesson_index)
+    
+    word_index, bit = divmod(lesson_index, WORD_BITS)
+    word_path = f"completed_lessons.{word_index}"
+    value = _bit_value(bit)
+    if completed:
+        # Bit is known clear, so adding it is the same as OR-ing it in (and
+        # subtracting clears a known-set bit); neither can overflow the word
+        bit_state = {"$or": [
+            {word_path: {"$exists": False}},
+            {word_path: {"$bitsAllClear": [bit]}}
+        ]}
+        operator, count_step = "$add", 1
+    else:
+        bit_state = {word_path: {"$bitsAllSet": [bit]}}
+        operator, count_step = "$subtract", -1
+    
+    before = await db.enrollments.find_one_and_update(
+        {"user_id": user_id, "course_id": course_id, **bit_state},
+        [
+            {"$set": {
+                "completed_lessons": _update_word(word_index, operator, value),
+                "completed_lesson_count": {"$add": [{"$ifNull": ["$completed_lesson_count", 0]}, count_step]},
+                "lesson_count": lesson_count
+            }},
+            _derive_progress(lesson_count)
+        ],
+        return_document=ReturnDocument.BEFORE
+    )
+    if before is None:
+        return None, 0
+    
+    words = list(before.get("completed_lessons") or [])
+    words += [0] * (word_index + 1 - len(words))
+    words[word_index] += int(value) * count_step
+    completed_lesson_count = before.get("completed_lesson_count", 0) + count_step
+    after = {
+        **before,
+        "completed_lessons": words,
+        "completed_lesson_count": completed_lesson_count,
+        "lesson_count": lesson_count,
+        "progress": round(completed_lesson_count / max(lesson_count, 1) * 100, 2),
+        "completed": completed_lesson_count >= lesson_count
+    }
+    delta = int(after["completed"]) - int(bool(before.get("completed")))
+    return after, delta
@@ -1,16 +1,33 @@
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, status, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from database import connect_to_mongo, close_mongo_connection, get_database
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from catalog_cache import get_catalog_entry, store_catalog_entry, catalog_response
+from database import connect_to_mongo, close_mongo_connection, reconcile_indexes, get_database, db as database
 from models import *
-from auth import hash_password, verify_password, create_access_token
-from dependencies import get_current_user, get_current_user_profile
+from auth import hash_password_async, verify_password_async, create_access_token, shutdown_password_pool, get_password_pool_stats
+from db_monitoring import get_pool_stats
+from metrics import MetricsMiddleware, render_metrics
+from query_budget import QueryBudgetMiddleware, query_budget
+from dependencies import get_current_user, get_current_user_fresh, get_current_user_profile, invalidate_user_cache, is_admin
 from config import settings
+from seeding import seed_database
+from leases import run_with_lease
+from serialization import FastJSONResponse, dumps, document_to_dict, documents_to_dicts
+from pagination import encode_cursor, keyset_filter
+from progress_buffer import progress_buffer
+from lesson_progress import get_lesson_count, set_lesson_completed, lesson_indexes, LessonOutOfRange
+from quiz_store import GRADING_PROJECTION, count_questions_by_quiz, get_answer_key, get_answer_keys, get_quiz_questions
+from user_stats import (
+    get_user_stats, record_enrollment, record_enrollments, record_enrollment_progress, record_course_completed,
+    record_quiz_result, record_quiz_results
+)
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from bson import ObjectId
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import List, Optional
+import asyncio
 import logging
-from seed_data import DUMMY_COURSES, DUMMY_QUIZZES
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -34,57 +51,33 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Next-Skip", "ETag"],
 )
+if settings.query_budget_mode != "off":
+    app.add_middleware(QueryBudgetMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 # Startup and shutdown events
 @app.on_event("startup")
 async def startup_db_client():
     await connect_to_mongo()
-    # Seed dummy data if collections are empty
-    await seed_dummy_data()
+    progress_buffer.start(get_database())
+    # One worker at a time runs the one-time startup work; the rest wait for it
+    await run_with_lease(get_database(), "startup", run_startup_tasks, ttl_seconds=settings.startup_lease_ttl_seconds)
+
+async def run_startup_tasks():
+    """Index reconciliation and seeding, both no-ops once their markers match"""
+    await reconcile_indexes(wait=True)
+    # Seed dummy data on first boot; later boots are a single marker lookup
+    if settings.seed_on_startup:
+        await seed_database(get_database(), database.client)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    # Flush buffered lesson positions while the connection is still open
+    await progress_buffer.stop()
     await close_mongo_connection()
-
-async def seed_dummy_data():
-    """Seed dummy courses and quizzes if database is empty"""
-    db = get_database()
-    
-    # Check if courses already exist
-    course_count = await db.courses.count_documents({})
-    if course_count == 0:
-        logger.info("Seeding dummy courses...")
-        course_ids = []
-        
-        for course_data in DUMMY_COURSES:
-            result = await db.courses.insert_one(course_data)
-            course_ids.append(result.inserted_id)
-            logger.info(f"Created course: {course_data['title']}")
-        
-        # Seed quizzes for each course
-        logger.info("Seeding dummy quizzes...")
-        for quiz_data in DUMMY_QUIZZES:
-            course_id = course_ids[quiz_data["course_index"]]
-            
-            # Separate questions from quiz data
-            questions = quiz_data.pop("questions")
-            quiz_data.pop("course_index")
-            quiz_data["course_id"] = str(course_id)
-            quiz_data["created_at"] = datetime.utcnow()
-            
-            # Insert quiz
-            quiz_result = await db.quizzes.insert_one(quiz_data)
-            quiz_id = quiz_result.inserted_id
-            
-            # Insert questions
-            for question in questions:
-                question["quiz_id"] = str(quiz_id)
-                await db.quiz_questions.insert_one(question)
-            
-            logger.info(f"Created quiz for course {quiz_data['course_id']}")
-        
-        logger.info("Dummy data seeding completed!")
+    shutdown_password_pool()
 
 # Health check
 @app.get("/")
@@ -95,6 +88,28 @@ async def root():
         "status": "running"
     }
 
+@app.get("/health/pool")
+async def pool_health():
+    """Mongo connection pool and bcrypt pool statistics"""
+    return {
+        "mongo": get_pool_stats(),
+        "password_hashing": get_password_pool_stats()
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of request, Mongo and bcrypt metrics"""
+    pool = get_pool_stats()
+    password_pool = get_password_pool_stats()
+    body = render_metrics({
+        "mongo_pool_open_connections": pool["open_connections"],
+        "mongo_pool_checked_out": pool["checked_out"],
+        "mongo_pool_waiters": pool["waiters"],
+        "mongo_pool_wait_seconds_max": pool["wait_seconds_max"],
+        "password_hash_in_flight": password_pool["in_flight"],
+    })
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
 # ==================== AUTH ROUTES ====================
 
 @app.post("/api/auth/register", response_model=Token, status_code=status.HTTP_201_CREATED)
@@ -111,7 +126,7 @@ async def register(user: UserCreate, db = Depends(get_database)):
     # Create new user
     user_data = {
         "email": user.email.lower(),
-        "password": hash_password(user.password),
+        "password": await hash_password_async(user.password),
         "profile_completed": False,
         "created_at": datetime.utcnow()
     }
@@ -136,7 +151,7 @@ async def login(user: UserLogin, db = Depends(get_database)):
     """Login user"""
     # Find user
     db_user = await db.users.find_one({"email": user.email.lower()})
-    if not db_user or not verify_password(user.password, db_user["password"]):
+    if not db_user or not await verify_password_async(user.password, db_user["password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -155,7 +170,7 @@ async def login(user: UserLogin, db = Depends(get_database)):
     return Token(access_token=access_token, user=user_response)
 
 @app.get("/api/auth/me", response_model=UserResponse)
-async def get_me(current_user = Depends(get_current_user)):
+async def get_me(current_user = Depends(get_current_user_fresh)):
     """Get current user info"""
     return UserResponse(
         id=str(current_user["_id"]),
@@ -201,6 +216,7 @@ async def create_profile(
         {"_id": current_user["_id"]},
         {"$set": {"profile_completed": True}}
     )
+    invalidate_user_cache(current_user["_id"])
     
     return ProfileResponse(
         id=str(result.inserted_id),
@@ -208,12 +224,8 @@ async def create_profile(
     )
 
 @app.get("/api/profile", response_model=ProfileResponse)
-async def get_profile(
-    current_user = Depends(get_current_user),
-    db = Depends(get_database)
-):
+async def get_profile(profile = Depends(get_current_user_profile)):
     """Get user profile"""
-    profile = await db.profiles.find_one({"user_id": str(current_user["_id"])})
     if not profile:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -247,6 +259,7 @@ async def update_profile(
             {"user_id": str(current_user["_id"])},
             {"$set": update_data}
         )
+        invalidate_user_cache(current_user["_id"])
     
     updated_profile = await db.profiles.find_one({"user_id": str(current_user["_id"])})
     
@@ -257,30 +270,115 @@ async def update_profile(
 
 # ==================== COURSE ROUTES ====================
 
+# Card fields for the catalog summary mode; lessons are reduced to a count in Mongo
+COURSE_SUMMARY_PROJECTION = {
+    "title": 1,
+    "description": 1,
+    "thumbnail": 1,
+    "duration": 1,
+    "level": 1,
+    "category": 1,
+    "created_at": 1,
+    "lesson_count": {"$size": {"$ifNull": ["$lessons", []]}}
+}
+
 @app.get("/api/courses", response_model=List[CourseResponse])
 async def get_courses(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
     category: Optional[str] = None,
+    cursor: Optional[str] = None,
+    summary: bool = False,
     db = Depends(get_database)
 ):
-    """Get all courses"""
+    """Get all courses, newest first, with keyset pagination via X-Next-Cursor"""
+    cache_key = ("courses", tuple(sorted(request.query_params.multi_items())))
+    entry = get_catalog_entry(cache_key)
+    if entry is not None:
+        return catalog_response(request, entry)
+    
     query = {}
     if category:
         query["category"] = category
-    
-    courses = await db.courses.find(query).skip(skip).limit(limit).to_list(length=limit)
-    
-    return [
-        CourseResponse(
-            id=str(course["_id"]),
-            **{k: v for k, v in course.items() if k != "_id"}
-        )
-        for course in courses
-    ]
+    if cursor:
+        query = {"$and": [query, keyset_filter("created_at", cursor)]}
+    
+    projection = COURSE_SUMMARY_PROJECTION if summary else None
+    courses = await db.courses.find(query, projection).sort(
+        [("created_at", -1), ("_id", -1)]
+    ).skip(skip).limit(limit).to_list(length=limit)
+    
+    headers = {}
+    if limit and len(courses) == limit:
+        headers["X-Next-Cursor"] = encode_cursor(courses[-1].get("created_at"), courses[-1]["_id"])
+    
+    # Documents come from our own collection, so they are shaped without re-validation
+    model = CourseSummaryResponse if summary else CourseResponse
+    entry = store_catalog_entry(cache_key, dumps(documents_to_dicts(model, courses)), headers)
+    return catalog_response(request, entry)
+
+@app.get("/api/courses/search", response_model=List[CourseSearchResult])
+async def search_courses(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db = Depends(get_database)
+):
+    """Relevance-ranked search over course titles, descriptions, categories and lessons"""
+    cache_key = ("search", tuple(sorted(request.query_params.multi_items())))
+    entry = get_catalog_entry(cache_key)
+    if entry is not None:
+        return catalog_response(request, entry)
+    
+    # Weighted text index "course_text" in database.INDEX_SPEC
+    courses = await db.courses.find(
+        {"$text": {"$search": q}},
+        {**COURSE_SUMMARY_PROJECTION, "score": {"$meta": "textScore"}}
+    ).sort([("score", {"$meta": "textScore"}), ("_id", -1)]).skip(skip).limit(limit).to_list(length=limit)
+    
+    headers = {}
+    if len(courses) == limit:
+        headers["X-Next-Skip"] = str(skip + limit)
+    
+    entry = store_catalog_entry(cache_key, dumps(documents_to_dicts(CourseSearchResult, courses)), headers)
+    return catalog_response(request, entry)
+
+@app.get("/api/courses/facets", response_model=CatalogFacets)
+async def get_course_facets(request: Request, db = Depends(get_database)):
+    """Categories and levels with course counts for catalog navigation"""
+    cache_key = ("facets",)
+    entry = get_catalog_entry(cache_key)
+    if entry is not None:
+        return catalog_response(request, entry)
+    
+    # One $group per facet in a single pass; cached until the next course write
+    facets = await db.courses.aggregate([
+        {"$facet": {
+            "categories": [
+                {"$group": {"_id": {"$ifNull": ["$category", "General"]}, "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}}
+            ],
+            "levels": [
+                {"$group": {"_id": {"$ifNull": ["$level", "Beginner"]}, "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}}
+            ],
+            "total": [{"$count": "count"}]
+        }}
+    ]).to_list(length=1)
+    facets = facets[0]
+    
+    content = {
+        "categories": [{"value": f["_id"], "count": f["count"]} for f in facets["categories"]],
+        "levels": [{"value": f["_id"], "count": f["count"]} for f in facets["levels"]],
+        "total": facets["total"][0]["count"] if facets["total"] else 0
+    }
+    entry = store_catalog_entry(cache_key, dumps(content))
+    return catalog_response(request, entry)
 
 @app.get("/api/courses/{course_id}", response_model=CourseResponse)
-async def get_course(course_id: str, db = Depends(get_database)):
+async def get_course(course_id: str, request: Request, db = Depends(get_database)):
     """Get course by ID"""
     if not ObjectId.is_valid(course_id):
         raise HTTPException(
@@ -288,6 +386,11 @@ async def get_course(course_id: str, db = Depends(get_database)):
             detail="Invalid course ID"
         )
     
+    cache_key = ("course", course_id)
+    entry = get_catalog_entry(cache_key)
+    if entry is not None:
+        return catalog_response(request, entry)
+    
     course = await db.courses.find_one({"_id": ObjectId(course_id)})
     if not course:
         raise HTTPException(
@@ -295,10 +398,8 @@ async def get_course(course_id: str, db = Depends(get_database)):
             detail="Course not found"
         )
     
-    return CourseResponse(
-        id=str(course["_id"]),
-        **{k: v for k, v in course.items() if k != "_id"}
-    )
+    entry = store_catalog_entry(cache_key, dumps(document_to_dict(CourseResponse, course)))
+    return catalog_response(request, entry)
 
 # ==================== ENROLLMENT ROUTES ====================
 
@@ -323,34 +424,131 @@ async def enroll_course(
             detail="Course not found"
         )
     
-    # Check if already enrolled
-    existing = await db.enrollments.find_one({
-        "user_id": str(current_user["_id"]),
-        "course_id": enrollment.course_id
-    })
-    
-    if existing:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Already enrolled in this course"
-        )
-    
-    # Create enrollment
+    # Create enrollment; the unique (user_id, course_id) index rejects duplicates
     enrollment_data = {
         "user_id": str(current_user["_id"]),
         "course_id": enrollment.course_id,
         "progress": 0.0,
         "enrolled_at": datetime.utcnow(),
-        "completed": False
+        "completed": False,
+        "completed_lessons": [],
+        "completed_lesson_count": 0,
+        "lesson_count": len(course.get("lessons", []))
     }
     
-    result = await db.enrollments.insert_one(enrollment_data)
+    try:
+        result = await db.enrollments.insert_one(enrollment_data)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Already enrolled in this course"
+        )
+    await record_enrollment(db, enrollment_data["user_id"], enrollment_data, course["title"])
     
     return EnrollmentResponse(
         id=str(result.inserted_id),
         **enrollment_data
     )
 
+# (user, course) pairs one bulk enrollment request may create
+BULK_ENROLLMENT_MAX_ITEMS = 5000
+
+@app.post("/api/enrollments/bulk")
+async def enroll_bulk(
+    bulk: BulkEnrollmentCreate,
+    current_user = Depends(get_current_user),
+    db = Depends(get_database)
+):
+    """Enroll the caller, or a cohort of users (admins only), in many courses"""
+    caller_id = str(current_user["_id"])
+    user_ids = list(dict.fromkeys(bulk.user_ids or [caller_id]))
+    course_ids = list(dict.fromkeys(bulk.course_ids))
+    
+    if user_ids != [caller_id] and not is_admin(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can enroll other users"
+        )
+    if len(user_ids) * len(course_ids) > BULK_ENROLLMENT_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {BULK_ENROLLMENT_MAX_ITEMS} enrollments per request"
+        )
+    
+    courses = await db.courses.find(
+        {"_id": {"$in": [ObjectId(course_id) for course_id in course_ids if ObjectId.is_valid(course_id)]}},
+        {"title": 1, "lesson_count": {"$size": {"$ifNull": ["$lessons", []]}}}
+    ).to_list(length=None)
+    courses = {str(course["_id"]): course for course in courses}
+    
+    if user_ids == [caller_id]:
+        known_users = {caller_id}
+    else:
+        users = await db.users.find(
+            {"_id": {"$in": [ObjectId(user_id) for user_id in user_ids if ObjectId.is_valid(user_id)]}},
+            {"_id": 1}
+        ).to_list(length=None)
+        known_users = {str(user["_id"]) for user in users}
+    
+    now = datetime.utcnow()
+    responses = []
+    enrollments = []
+    response_indexes = []
+    for user_id in user_ids:
+        for course_id in course_ids:
+            if user_id not in known_users:
+                responses.append({"user_id": user_id, "course_id": course_id, "status": "error", "detail": "User not found"})
+            elif course_id not in courses:
+                responses.append({"user_id": user_id, "course_id": course_id, "status": "error", "detail": "Course not found"})
+            else:
+                response_indexes.append(len(responses))
+                responses.append(None)
+                enrollments.append({
+                    "user_id": user_id,
+                    "course_id": course_id,
+                    "progress": 0.0,
+                    "enrolled_at": now,
+                    "completed": False,
+                    "completed_lessons": [],
+                    "completed_lesson_count": 0,
+                    "lesson_count": courses[course_id]["lesson_count"]
+                })
+    
+    # The unique (user_id, course_id) index rejects existing pairs; unordered so the rest still land
+    write_errors = {}
+    if enrollments:
+        try:
+            await db.enrollments.bulk_write([InsertOne(enrollment) for enrollment in enrollments], ordered=False)
+        except BulkWriteError as e:
+            write_errors = {error["index"]: error for error in e.details.get("writeErrors", [])}
+    
+    created = []
+    for op_index, (index, enrollment) in enumerate(zip(response_indexes, enrollments)):
+        error = write_errors.get(op_index)
+        if error is None:
+            created.append((enrollment, courses[enrollment["course_id"]]["title"]))
+            responses[index] = {
+                "user_id": enrollment["user_id"],
+                "course_id": enrollment["course_id"],
+                "status": "enrolled",
+                "id": str(enrollment["_id"])
+            }
+        elif error.get("code") == 11000:
+            responses[index] = {"user_id": enrollment["user_id"], "course_id": enrollment["course_id"], "status": "already_enrolled"}
+        else:
+            responses[index] = {
+                "user_id": enrollment["user_id"],
+                "course_id": enrollment["course_id"],
+                "status": "error",
+                "detail": error.get("errmsg", "Write failed")
+            }
+    
+    if created:
+        await record_enrollments(db, created)
+        logger.info(f"Bulk enrolled {len(created)} of {len(responses)} requested enrollments")
+    
+    return FastJSONResponse(content=responses)
+
 @app.get("/api/enrollments", response_model=List[EnrollmentResponse])
 async def get_enrollments(
     current_user = Depends(get_current_user),
@@ -361,13 +559,7 @@ async def get_enrollments(
         {"user_id": str(current_user["_id"])}
     ).to_list(length=100)
     
-    return [
-        EnrollmentResponse(
-            id=str(e["_id"]),
-            **{k: v for k, v in e.items() if k != "_id"}
-        )
-        for e in enrollments
-    ]
+    return FastJSONResponse(content=documents_to_dicts(EnrollmentResponse, enrollments))
 
 @app.get("/api/enrollments/{course_id}/status")
 async def get_enrollment_status(
@@ -383,29 +575,201 @@ async def get_enrollment_status(
     
     return {"enrolled": enrollment is not None}
 
+async def _update_lesson(course_id: str, lesson_index: int, completed: bool, current_user, db):
+    if not ObjectId.is_valid(course_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid course ID"
+        )
+    
+    lesson_count = await get_lesson_count(db, course_id)
+    if lesson_count is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Course not found"
+        )
+    
+    user_id = str(current_user["_id"])
+    try:
+        enrollment, completion_delta = await set_lesson_completed(
+            db, user_id, course_id, lesson_index, lesson_count, completed
+        )
+    except LessonOutOfRange:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid lesson index"
+        )
+    
+    if enrollment is None:
+        # Either not enrolled, or the lesson was already in the requested state
+        enrollment = await db.enrollments.find_one({"user_id": user_id, "course_id": course_id})
+        if enrollment is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Not enrolled in this course"
+            )
+    else:
+        await record_enrollment_progress(db, user_id, course_id, enrollment["progress"])
+        if completion_delta:
+            await record_course_completed(db, user_id, completion_delta)
+    
+    return LessonProgressResponse(
+        course_id=course_id,
+        completed_lessons=lesson_indexes(enrollment.get("completed_lessons")),
+        completed_lesson_count=enrollment.get("completed_lesson_count", 0),
+        lesson_count=enrollment.get("lesson_count", lesson_count),
+        progress=enrollment.get("progress", 0.0),
+        completed=enrollment.get("completed", False)
+    )
+
+@app.post("/api/enrollments/{course_id}/lessons/{lesson_index}/complete", response_model=LessonProgressResponse)
+async def complete_lesson(
+    course_id: str,
+    lesson_index: int,
+    current_user = Depends(get_current_user),
+    db = Depends(get_database)
+):
+    """Mark a lesson as completed"""
+    return await _update_lesson(course_id, lesson_index, True, current_user, db)
+
+@app.delete("/api/enrollments/{course_id}/lessons/{lesson_index}/complete", response_model=LessonProgressResponse)
+async def uncomplete_lesson(
+    course_id: str,
+    lesson_index: int,
+    current_user = Depends(get_current_user),
+    db = Depends(get_database)
+):
+    """Mark a lesson as not completed"""
+    return await _update_lesson(course_id, lesson_index, False, current_user, db)
+
+@app.post("/api/enrollments/{course_id}/lessons/{lesson_index}/heartbeat", status_code=status.HTTP_202_ACCEPTED)
+async def lesson_heartbeat(
+    course_id: str,
+    lesson_index: int,
+    heartbeat: LessonHeartbeat,
+    current_user = Depends(get_current_user),
+    db = Depends(get_database)
+):
+    """Record the watch position of a lesson; written to Mongo in batches"""
+    if not ObjectId.is_valid(course_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid course ID"
+        )
+    
+    # Served from cache, so heartbeats normally reach no collection at all
+    lesson_count = await get_lesson_count(db, course_id)
+    if lesson_count is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Course not found"
+        )
+    if not 0 <= lesson_index < lesson_count:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid lesson index"
+        )
+    
+    await progress_buffer.add(str(current_user["_id"]), course_id, lesson_index, heartbeat.position_seconds)
+    return {"buffered": True}
+
 # ==================== QUIZ ROUTES ====================
 
 @app.get("/api/quizzes/course/{course_id}", response_model=List[QuizResponse])
+@query_budget(2)
 async def get_course_quizzes(course_id: str, db = Depends(get_database)):
     """Get quizzes for a course"""
-    quizzes = await db.quizzes.find({"course_id": course_id}).to_list(length=100)
+    quizzes = await db.quizzes.find({"course_id": course_id}, {"questions": 0}).to_list(length=100)
     
-    results = []
-    for quiz in quizzes:
-        question_count = await db.quiz_questions.count_documents({"quiz_id": str(quiz["_id"])})
-        results.append(
-            QuizResponse(
-                id=str(quiz["_id"]),
-                course_id=quiz["course_id"],
-                title=quiz["title"],
-                description=quiz.get("description"),
-                total_questions=question_count,
-                passing_score=quiz["passing_score"],
-                time_limit=quiz.get("time_limit")
-            )
+    # question_count is denormalized onto quizzes; anything not yet
+    # backfilled is counted in one batched aggregation
+    missing = [str(q["_id"]) for q in quizzes if "question_count" not in q]
+    fallback_counts = await count_questions_by_quiz(db, missing)
+    
+    return [
+        QuizResponse(
+            id=str(quiz["_id"]),
+            course_id=quiz["course_id"],
+            title=quiz["title"],
+            description=quiz.get("description"),
+            total_questions=quiz.get("question_count", fallback_counts.get(str(quiz["_id"]), 0)),
+            passing_score=quiz["passing_score"],
+            time_limit=quiz.get("time_limit")
         )
+        for quiz in quizzes
+    ]
+
+def quiz_result_item(r: dict) -> dict:
+    """Response shape of a stored quiz result"""
+    return {
+        "id": str(r["_id"]),
+        "user_id": str(r.get("user_id", "")),
+        "quiz_id": str(r.get("quiz_id", "")),
+        "score": float(r.get("score", 0)),
+        "total_questions": int(r.get("total_questions", 0)),
+        "correct_answers": int(r.get("correct_answers", 0)),
+        "passed": bool(r.get("passed", False)),
+        "attempted_at": r.get("attempted_at") or datetime.utcnow()
+    }
+
+# Newest first with an _id tie-break, served by the (user_id, attempted_at, _id) index
+QUIZ_RESULT_SORT = [("attempted_at", -1), ("_id", -1)]
+
+@app.get("/api/quizzes/results")
+async def get_quiz_results(
+    current_user = Depends(get_current_user),
+    db = Depends(get_database)
+):
+    """Get user's recent quiz results"""
+    user_id = str(current_user["_id"])
     
-    return results
+    # Get recent quiz results (same as dashboard)
+    results = await db.quiz_results.find(
+        {"user_id": user_id}
+    ).sort(QUIZ_RESULT_SORT).limit(20).to_list(length=20)
+    
+    # orjson writes datetimes as ISO strings natively
+    return FastJSONResponse(content=[quiz_result_item(r) for r in results])
+
+@app.get("/api/quizzes/results/history")
+async def get_quiz_result_history(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    current_user = Depends(get_current_user),
+    db = Depends(get_database)
+):
+    """Page through the user's full quiz history, newest first, via X-Next-Cursor"""
+    query = {"user_id": str(current_user["_id"])}
+    if cursor:
+        query = {"$and": [query, keyset_filter("attempted_at", cursor)]}
+    
+    results = await db.quiz_results.find(query).sort(QUIZ_RESULT_SORT).limit(limit).to_list(length=limit)
+    
+    headers = None
+    if len(results) == limit:
+        headers = {"X-Next-Cursor": encode_cursor(results[-1].get("attempted_at"), results[-1]["_id"])}
+    
+    return FastJSONResponse(content=[quiz_result_item(r) for r in results], headers=headers)
+
+@app.get("/api/quizzes/results/export")
+async def export_quiz_results(
+    current_user = Depends(get_current_user),
+    db = Depends(get_database)
+):
+    """Stream the user's complete quiz history as NDJSON"""
+    user_id = str(current_user["_id"])
+    
+    async def ndjson_lines():
+        # Reads straight off the Motor cursor, one batch in memory at a time
+        cursor = db.quiz_results.find({"user_id": user_id}).sort(QUIZ_RESULT_SORT).batch_size(500)
+        async for r in cursor:
+            yield dumps(quiz_result_item(r)) + b"\n"
+    
+    return StreamingResponse(
+        ndjson_lines(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="quiz-results.ndjson"'}
+    )
 
 @app.get("/api/quizzes/{quiz_id}")
 async def get_quiz(quiz_id: str, db = Depends(get_database)):
@@ -423,8 +787,8 @@ async def get_quiz(quiz_id: str, db = Depends(get_database)):
             detail="Quiz not found"
         )
     
-    # Get questions (without showing correct answers)
-    questions = await db.quiz_questions.find({"quiz_id": quiz_id}).to_list(length=100)
+    # Get questions (without showing correct answers); embedded quizzes need no second query
+    questions = await get_quiz_questions(db, quiz)
     
     quiz_questions = []
     for q in questions:
@@ -461,33 +825,26 @@ async def attempt_quiz(
                 detail="Invalid quiz ID"
             )
         
-        quiz = await db.quizzes.find_one({"_id": ObjectId(quiz_id)})
+        quiz = await db.quizzes.find_one({"_id": ObjectId(quiz_id)}, GRADING_PROJECTION)
         if not quiz:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Quiz not found"
             )
         
-        # Get questions with correct answers
-        questions = await db.quiz_questions.find({"quiz_id": quiz_id}).to_list(length=100)
+        # Grade against the compiled answer key (legacy quizzes only fetch questions on a cache miss)
+        answer_key = await get_answer_key(db, quiz)
         
-        if len(attempt.answers) != len(questions):
+        if len(attempt.answers) != answer_key.total_questions:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Number of answers doesn't match number of questions"
             )
         
-        # Calculate score
-        correct_answers = 0
-        for i, question in enumerate(questions):
-            user_answer_index = attempt.answers[i]
-            if 0 <= user_answer_index < len(question["options"]):
-                if question["options"][user_answer_index]["is_correct"]:
-                    correct_answers += 1
-        
-        total_questions = len(questions)
+        correct_answers = answer_key.grade(attempt.answers)
+        total_questions = answer_key.total_questions
         score = (correct_answers / total_questions) * 100
-        passed = score >= quiz["passing_score"]
+        passed = score >= answer_key.passing_score
         
         # Save result
         result_data = {
@@ -501,6 +858,7 @@ async def attempt_quiz(
         }
         
         result = await db.quiz_results.insert_one(result_data)
+        await record_quiz_result(db, result_data["user_id"], result_data, quiz["title"])
         logger.info(f"Quiz result saved: {result.inserted_id} for user {current_user['_id']}")
         
         # Return as plain JSON
@@ -523,44 +881,96 @@ async def attempt_quiz(
             detail="Failed to submit quiz"
         )
 
-@app.get("/api/quizzes/results")
-async def get_quiz_results(
+@app.post("/api/quizzes/attempts/batch")
+async def attempt_quizzes_batch(
+    batch: QuizBatchAttempt,
     current_user = Depends(get_current_user),
     db = Depends(get_database)
 ):
-    """Get user's recent quiz results"""
+    """Submit many quiz attempts (e.g. replayed from an offline client) in one request"""
     user_id = str(current_user["_id"])
-    
-    # Get recent quiz results (same as dashboard)
-    results = await db.quiz_results.find(
-        {"user_id": user_id}
-    ).sort("attempted_at", -1).limit(20).to_list(length=20)
-    
-    # Convert to response format with ISO datetime strings
-    response_list = []
-    for r in results:
-        attempted_at = r.get("attempted_at")
-        if isinstance(attempted_at, datetime):
-            attempted_at_str = attempted_at.isoformat()
+    now = datetime.utcnow()
+    
+    # Group attempts by quiz so each quiz is loaded and graded once
+    indexes_by_quiz = {}
+    responses = [None] * len(batch.attempts)
+    for index, item in enumerate(batch.attempts):
+        if not ObjectId.is_valid(item.quiz_id):
+            responses[index] = {"index": index, "quiz_id": item.quiz_id, "status": "error", "detail": "Invalid quiz ID"}
         else:
-            attempted_at_str = datetime.utcnow().isoformat()
-        
-        response_list.append({
-            "id": str(r["_id"]),
-            "user_id": str(r.get("user_id", "")),
-            "quiz_id": str(r.get("quiz_id", "")),
-            "score": float(r.get("score", 0)),
-            "total_questions": int(r.get("total_questions", 0)),
-            "correct_answers": int(r.get("correct_answers", 0)),
-            "passed": bool(r.get("passed", False)),
-            "attempted_at": attempted_at_str
-        })
+            indexes_by_quiz.setdefault(item.quiz_id, []).append(index)
+    
+    quizzes = await db.quizzes.find(
+        {"_id": {"$in": [ObjectId(quiz_id) for quiz_id in indexes_by_quiz]}},
+        GRADING_PROJECTION
+    ).to_list(length=None)
+    quizzes = {str(quiz["_id"]): quiz for quiz in quizzes}
+    answer_keys = await get_answer_keys(db, list(quizzes.values()))
     
-    return JSONResponse(content=response_list)
+    results = []
+    result_indexes = []
+    for quiz_id, indexes in indexes_by_quiz.items():
+        answer_key = answer_keys.get(quiz_id)
+        if answer_key is None:
+            for index in indexes:
+                responses[index] = {"index": index, "quiz_id": quiz_id, "status": "error", "detail": "Quiz not found"}
+            continue
+        if answer_key.total_questions == 0:
+            for index in indexes:
+                responses[index] = {"index": index, "quiz_id": quiz_id, "status": "error", "detail": "Quiz has no questions"}
+            continue
+        
+        gradable = []
+        for index in indexes:
+            if len(batch.attempts[index].answers) != answer_key.total_questions:
+                responses[index] = {
+                    "index": index,
+                    "quiz_id": quiz_id,
+                    "status": "error",
+                    "detail": "Number of answers doesn't match number of questions"
+                }
+            else:
+                gradable.append(index)
+        
+        correct_counts = answer_key.grade_many([batch.attempts[index].answers for index in gradable])
+        for index, correct_answers in zip(gradable, correct_counts):
+            score = (correct_answers / answer_key.total_questions) * 100
+            attempted_at = batch.attempts[index].attempted_at
+            if attempted_at and attempted_at.tzinfo:
+                attempted_at = attempted_at.astimezone(timezone.utc).replace(tzinfo=None)
+            results.append({
+                "user_id": user_id,
+                "quiz_id": quiz_id,
+                "score": score,
+                "total_questions": answer_key.total_questions,
+                "correct_answers": correct_answers,
+                "passed": score >= answer_key.passing_score,
+                # Client clocks may run ahead; never store an attempt in the future
+                "attempted_at": min(attempted_at, now) if attempted_at else now
+            })
+            result_indexes.append(index)
+    
+    if results:
+        inserted = await db.quiz_results.insert_many(results)
+        await record_quiz_results(db, user_id, [
+            (result, quizzes[result["quiz_id"]]["title"]) for result in results
+        ])
+        logger.info(f"Saved {len(results)} batched quiz results for user {user_id}")
+        
+        for index, result_id, result in zip(result_indexes, inserted.inserted_ids, results):
+            responses[index] = {
+                "index": index,
+                "status": "graded",
+                "id": str(result_id),
+                **{k: v for k, v in result.items() if k != "_id"}
+            }
+    
+    return FastJSONResponse(content=responses)
 
 # ==================== DASHBOARD ROUTES ====================
 
 @app.get("/api/dashboard", response_model=DashboardStats)
+@query_budget(7)
 async def get_dashboard(
     current_user = Depends(get_current_user),
     db = Depends(get_database)
@@ -568,65 +978,25 @@ async def get_dashboard(
     """Get dashboard statistics"""
     user_id = str(current_user["_id"])
     
-    # Get stats
-    total_courses = await db.courses.count_documents({})
-    enrolled_courses = await db.enrollments.count_documents({"user_id": user_id})
-    completed_courses = await db.enrollments.count_documents({
-        "user_id": user_id,
-        "completed": True
-    })
-    
-    total_quizzes = await db.quizzes.count_documents({})
-    attempted_quizzes = await db.quiz_results.count_documents({"user_id": user_id})
-    
-    # Calculate average score
-    results = await db.quiz_results.find({"user_id": user_id}).to_list(length=1000)
-    average_score = sum(r["score"] for r in results) / len(results) if results else 0
-    
-    # Get recent enrollments with course details
-    recent_enrollments_data = await db.enrollments.find(
-        {"user_id": user_id}
-    ).sort("enrolled_at", -1).limit(5).to_list(length=5)
-    
-    recent_enrollments = []
-    for enrollment in recent_enrollments_data:
-        course = await db.courses.find_one({"_id": ObjectId(enrollment["course_id"])})
-        if course:
-            recent_enrollments.append({
-                "course_id": enrollment["course_id"],
-                "course_title": course["title"],
-                "enrolled_at": enrollment["enrolled_at"],
-                "progress": enrollment["progress"]
-            })
+    # Per-user numbers come from the incrementally maintained user_stats document
+    stats, total_courses, total_quizzes = await asyncio.gather(
+        get_user_stats(db, user_id),
+        db.courses.estimated_document_count(),
+        db.quizzes.estimated_document_count()
+    )
     
-    # Get recent quiz results with quiz details
-    recent_quiz_results_data = await db.quiz_results.find(
-        {"user_id": user_id}
-    ).sort("attempted_at", -1).limit(5).to_list(length=5)
-    
-    recent_quiz_results = []
-    for result in recent_quiz_results_data:
-        quiz = await db.quizzes.find_one({"_id": ObjectId(result["quiz_id"])})
-        if quiz:
-            recent_quiz_results.append({
-                "quiz_id": result["quiz_id"],
-                "quiz_title": quiz["title"],
-                "score": result["score"],
-                "correct_answers": result.get("correct_answers", 0),
-                "total_questions": result.get("total_questions", 0),
-                "passed": result["passed"],
-                "attempted_at": result["attempted_at"]
-            })
+    attempted_quizzes = stats["attempted_quizzes"]
+    average_score = stats["score_sum"] / attempted_quizzes if attempted_quizzes else 0
     
     return DashboardStats(
         total_courses=total_courses,
-        enrolled_courses=enrolled_courses,
-        completed_courses=completed_courses,
+        enrolled_courses=stats["enrolled_courses"],
+        completed_courses=stats["completed_courses"],
         total_quizzes=total_quizzes,
         attempted_quizzes=attempted_quizzes,
         average_score=round(average_score, 2),
-        recent_enrollments=recent_enrollments,
-        recent_quiz_results=recent_quiz_results
+        recent_enrollments=stats["recent_enrollments"],
+        recent_quiz_results=stats["recent_quiz_results"]
     )
 
 if __name__ == "__main__":
@@ -0,0 +1,168 @@
+from starlette.routing import Match
+from typing import Dict, Tuple
+import threading
+import time
+
+# Latency buckets in seconds, shared by request, Mongo and bcrypt histograms
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+    
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+class Gauge(Counter):
+    def dec(self, *labels, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+    
+    def set(self, *labels, value: float):
+        with self._lock:
+            self._values[labels] = value
+    
+    def render(self) -> list:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._values: Dict[tuple, list] = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+    
+    def observe(self, *labels, value: float):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = [0] * len(self.buckets) + [0.0, 0]
+                self._values[labels] = state
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+    
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, state in self._values.items():
+                for bound, count in zip(self.buckets, state):
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {count}")
+                inf = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, inf)} {state[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {state[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {state[-1]}")
+        return lines
+
+# Metrics are per process; with several uvicorn workers each one reports its own
+REQUESTS = Counter("http_requests_total", "HTTP requests by route template, method and status", ("method", "route", "status"))
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency by route template", ("method", "route"))
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served", ("method", "route"))
+MONGO_COMMANDS = Counter("mongo_commands_total", "Mongo commands by collection, command and outcome", ("collection", "command", "outcome"))
+MONGO_COMMAND_LATENCY = Histogram("mongo_command_duration_seconds", "Mongo command latency by collection and command", ("collection", "command"))
+PASSWORD_POOL_WAIT = Histogram("password_hash_wait_seconds", "Time bcrypt jobs wait for a worker", ())
+PASSWORD_POOL_REJECTED = Counter("password_hash_rejected_total", "bcrypt jobs rejected because the queue was full", ())
+PROGRESS_HEARTBEATS = Counter("progress_heartbeats_total", "Lesson heartbeats by whether they opened a buffer entry or coalesced into one", ("outcome",))
+PROGRESS_BUFFER_SIZE = Gauge("progress_buffer_entries", "Lesson positions waiting to be flushed", ())
+PROGRESS_FLUSH_BATCH = Histogram("progress_flush_batch_size", "Entries per lesson-position bulk write", (), buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000))
+PROGRESS_FLUSH_LAG = Histogram("progress_flush_lag_seconds", "Time from first buffered heartbeat to its flush", ())
+
+REGISTRY = [
+    REQUESTS,
+    REQUEST_LATENCY,
+    REQUESTS_IN_FLIGHT,
+    MONGO_COMMANDS,
+    MONGO_COMMAND_LATENCY,
+    PASSWORD_POOL_WAIT,
+    PASSWORD_POOL_REJECTED,
+    PROGRESS_HEARTBEATS,
+    PROGRESS_BUFFER_SIZE,
+    PROGRESS_FLUSH_BATCH,
+    PROGRESS_FLUSH_LAG,
+]
+
+def render_metrics(extra_gauges: Dict[str, float] = None) -> str:
+    """Prometheus text exposition of every registered metric"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for name, value in (extra_gauges or {}).items():
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+def match_route(scope):
+    """Route that will serve this request, or None when nothing matches"""
+    app = scope.get("app")
+    if app is None:
+        return None
+    partial = None
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route
+        if match == Match.PARTIAL and partial is None:
+            partial = route
+    return partial
+
+def route_template(scope) -> str:
+    """Path template of the route serving this request, keeping label cardinality bounded"""
+    route = match_route(scope)
+    return route.path if route is not None else "unmatched"
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts, latency and in-flight requests"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        method = scope["method"]
+        route = route_template(scope)
+        status_code = 500
+        
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        REQUESTS_IN_FLIGHT.inc(method, route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec(method, route)
+            REQUEST_LATENCY.observe(method, route, value=time.perf_counter() - started)
+            REQUESTS.inc(method, route, str(status_code))
@@ -106,10 +106,37 @@ class CourseResponse(BaseModel):
     class Config:
         json_encoders = {ObjectId: str}
 
+class CourseSummaryResponse(BaseModel):
+    id: str
+    title: str
+    description: str
+    thumbnail: Optional[str] = None
+    lesson_count: int
+    duration: Optional[str] = None
+    level: Optional[str] = "Beginner"
+    category: Optional[str] = "General"
+    created_at: datetime
+
+class CourseSearchResult(CourseSummaryResponse):
+    score: float
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class CatalogFacets(BaseModel):
+    categories: List[FacetCount]
+    levels: List[FacetCount]
+    total: int
+
 # Enrollment Models
 class EnrollmentCreate(BaseModel):
     course_id: str
 
+class BulkEnrollmentCreate(BaseModel):
+    course_ids: List[str] = Field(..., min_length=1, max_length=200)
+    user_ids: Optional[List[str]] = Field(None, min_length=1, max_length=1000)  # defaults to the caller
+
 class EnrollmentResponse(BaseModel):
     id: str
     user_id: str
@@ -121,6 +148,17 @@ class EnrollmentResponse(BaseModel):
     class Config:
         json_encoders = {ObjectId: str}
 
+class LessonProgressResponse(BaseModel):
+    course_id: str
+    completed_lessons: List[int]
+    completed_lesson_count: int
+    lesson_count: int
+    progress: float
+    completed: bool
+
+class LessonHeartbeat(BaseModel):
+    position_seconds: float = Field(..., ge=0)
+
 # Quiz Models
 class QuizOption(BaseModel):
     option: str
@@ -155,6 +193,14 @@ class QuizAttempt(BaseModel):
     quiz_id: str
     answers: List[int]  # List of selected option indexes
 
+class QuizBatchAttemptItem(BaseModel):
+    quiz_id: str
+    answers: List[int]
+    attempted_at: Optional[datetime] = None  # when the client recorded it, for offline replay
+
+class QuizBatchAttempt(BaseModel):
+    attempts: List[QuizBatchAttemptItem] = Field(..., min_length=1, max_length=500)
+
 class QuizResultResponse(BaseModel):
     id: str
     user_id: str
@@ -0,0 +1,37 @@
+from fastapi import HTTPException, status
+from bson import ObjectId
+from datetime import datetime
+from typing import Optional
+import base64
+import json
+
+def encode_cursor(sort_value: Optional[datetime], doc_id: ObjectId) -> str:
+    """Opaque keyset cursor for a (timestamp, _id) position; the timestamp may be missing"""
+    timestamp = sort_value.isoformat() if sort_value is not None else None
+    raw = json.dumps({"t": timestamp, "id": str(doc_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    """Decode a cursor produced by encode_cursor into (timestamp, ObjectId)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        timestamp = datetime.fromisoformat(data["t"]) if data["t"] is not None else None
+        return timestamp, ObjectId(data["id"])
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def keyset_filter(field: str, cursor: str) -> dict:
+    """Query matching documents after the cursor in (field desc, _id desc) order"""
+    sort_value, doc_id = decode_cursor(cursor)
+    # Missing/null timestamps sort last in descending order and never match $lt
+    if sort_value is None:
+        return {field: None, "_id": {"$lt": doc_id}}
+    return {"$or": [
+        {field: {"$lt": sort_value}},
+        {field: sort_value, "_id": {"$lt": doc_id}},
+        {field: None}
+    ]}
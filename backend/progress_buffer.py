@@ -0,0 +1,154 @@
+"""Write-behind buffer for lesson watch-position heartbeats.
+
+Heartbeats are coalesced in memory by (user_id, course_id, lesson) and
+flushed periodically as unordered bulk writes to ``lesson_positions``, so a
+player reporting every few seconds costs one upsert per flush interval
+instead of one per heartbeat. Buffers are per worker; the upsert only moves
+``position``/``updated_at`` forward in heartbeat time and takes the ``$max``
+of ``max_position``, so flushes from several workers in any order converge
+on the newest heartbeat.
+"""
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError, BulkWriteError
+from datetime import datetime
+from config import settings
+from metrics import PROGRESS_BUFFER_SIZE, PROGRESS_FLUSH_BATCH, PROGRESS_FLUSH_LAG, PROGRESS_HEARTBEATS
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1)
+
+class ProgressBuffer:
+    def __init__(self, max_entries: int, flush_interval: float, batch_size: int):
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        # key -> {"position", "max_position", "updated_at", "first_buffered"}
+        self._pending = {}
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+        self._db = None
+    
+    def __len__(self):
+        return len(self._pending)
+    
+    def start(self, db):
+        """Begin periodic flushing to the given database"""
+        self._db = db
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the flush loop and write out whatever is still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._db is not None:
+            await self.flush()
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Progress buffer flush failed")
+    
+    async def add(self, user_id: str, course_id: str, lesson: int, position: float):
+        """Buffer one heartbeat, flushing first if the buffer is full"""
+        key = (user_id, course_id, lesson)
+        entry = self._pending.get(key)
+        if entry is None and len(self._pending) >= self.max_entries and self._db is not None:
+            # Backpressure: the caller waits for a flush rather than growing the buffer
+            await self.flush()
+            entry = self._pending.get(key)
+        
+        now = datetime.utcnow()
+        if entry is None:
+            self._pending[key] = {
+                "position": position,
+                "max_position": position,
+                "updated_at": now,
+                "first_buffered": time.monotonic()
+            }
+            PROGRESS_HEARTBEATS.inc("buffered")
+        else:
+            entry["position"] = position
+            entry["max_position"] = max(entry["max_position"], position)
+            entry["updated_at"] = now
+            PROGRESS_HEARTBEATS.inc("coalesced")
+        PROGRESS_BUFFER_SIZE.set(value=len(self._pending))
+    
+    async def flush(self) -> int:
+        """Write every buffered heartbeat; returns the number of entries flushed"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+            PROGRESS_BUFFER_SIZE.set(value=0)
+            
+            items = list(pending.items())
+            flushed = 0
+            for start in range(0, len(items), self.batch_size):
+                batch = items[start:start + self.batch_size]
+                try:
+                    await self._db.lesson_positions.bulk_write(
+                        [_position_update(key, entry) for key, entry in batch],
+                        ordered=False
+                    )
+                except BulkWriteError as e:
+                    # Unordered: everything except the reported errors was applied
+                    logger.warning("Progress flush had %d write errors", len(e.details.get("writeErrors", [])))
+                except PyMongoError:
+                    logger.exception("Progress flush failed, re-buffering %d entries", len(batch))
+                    self._requeue(batch)
+                    continue
+                
+                now = time.monotonic()
+                PROGRESS_FLUSH_BATCH.observe(value=len(batch))
+                for _, entry in batch:
+                    PROGRESS_FLUSH_LAG.observe(value=now - entry["first_buffered"])
+                flushed += len(batch)
+            return flushed
+    
+    def _requeue(self, batch):
+        """Put failed entries back unless newer heartbeats arrived meanwhile"""
+        for key, entry in batch:
+            current = self._pending.get(key)
+            if current is not None:
+                current["max_position"] = max(current["max_position"], entry["max_position"])
+                current["first_buffered"] = min(current["first_buffered"], entry["first_buffered"])
+            elif len(self._pending) < self.max_entries:
+                self._pending[key] = entry
+        PROGRESS_BUFFER_SIZE.set(value=len(self._pending))
+
+def _position_update(key, entry) -> UpdateOne:
+    user_id, course_id, lesson = key
+    is_newer = {"$gt": [entry["updated_at"], {"$ifNull": ["$updated_at", EPOCH]}]}
+    # Pipeline update: the fields below are evaluated against the stored document,
+    # so a flush holding an older heartbeat leaves a newer position in place
+    return UpdateOne(
+        {"_id": f"{user_id}:{course_id}:{lesson}"},
+        [{"$set": {
+            "user_id": user_id,
+            "course_id": course_id,
+            "lesson": lesson,
+            "position": {"$cond": [is_newer, entry["position"], "$position"]},
+            "updated_at": {"$cond": [is_newer, entry["updated_at"], "$updated_at"]},
+            "max_position": {"$max": ["$max_position", entry["max_position"]]}
+        }}],
+        upsert=True
+    )
+
+progress_buffer = ProgressBuffer(
+    max_entries=settings.progress_buffer_max_entries,
+    flush_interval=settings.progress_flush_interval_seconds,
+    batch_size=settings.progress_flush_batch_size
+)
@@ -0,0 +1,127 @@
+from pymongo import monitoring
+from collections import Counter
+from contextvars import ContextVar
+from config import settings
+from metrics import match_route
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Cursor continuations and cleanup are not new queries
+IGNORED_COMMANDS = {"getMore", "killCursors", "endSessions"}
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+def query_budget(max_commands: int):
+    """Set a route's Mongo command budget, overriding settings.query_budget_default"""
+    def decorator(func):
+        func.__query_budget__ = max_commands
+        return func
+    return decorator
+
+def _shape(value):
+    """Query structure with literal values blanked out"""
+    if isinstance(value, dict):
+        return tuple((k, _shape(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        shapes = []
+        for item in value:
+            shape = _shape(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return tuple(shapes)
+    return "?"
+
+def command_shape(command_name: str, command: dict) -> tuple:
+    """Collection, command and filter shape identifying 'the same query'"""
+    target = command.get(command_name)
+    collection = target if isinstance(target, str) else "-"
+    if command_name == "aggregate":
+        body = command.get("pipeline")
+    elif command_name in ("update", "delete"):
+        body = [statement.get("q") for statement in command.get(command_name + "s", [])]
+    elif command_name in ("count", "findAndModify"):
+        body = command.get("query")
+    elif command_name == "insert":
+        body = None
+    else:
+        body = command.get("filter")
+    return collection, command_name, _shape(body)
+
+class QueryRecorder:
+    """Mongo commands issued while serving one request"""
+    
+    def __init__(self):
+        self.commands = []
+    
+    @property
+    def count(self) -> int:
+        return len(self.commands)
+    
+    def repeated_shapes(self, threshold: int) -> list:
+        return [
+            (shape, times)
+            for shape, times in Counter(self.commands).items()
+            if times >= threshold
+        ]
+
+_current_recorder: ContextVar = ContextVar("query_recorder", default=None)
+
+class QueryRecorderListener(monitoring.CommandListener):
+    """Feeds commands into the recorder of the request that issued them.
+    
+    Motor copies the caller's context into its executor threads, so the
+    contextvar set by the middleware is visible here.
+    """
+    
+    def started(self, event):
+        recorder = _current_recorder.get()
+        if recorder is not None and event.command_name not in IGNORED_COMMANDS:
+            recorder.commands.append(command_shape(event.command_name, event.command))
+    
+    def succeeded(self, event):
+        pass
+    
+    def failed(self, event):
+        pass
+
+query_recorder_listener = QueryRecorderListener()
+
+def check_query_budget(route_path: str, budget: int, recorder: QueryRecorder):
+    """Warn about, or raise for, a request over budget or repeating a query shape"""
+    problems = []
+    if recorder.count > budget:
+        problems.append(f"{recorder.count} Mongo commands (budget {budget})")
+    for (collection, command_name, _), times in recorder.repeated_shapes(settings.query_repeat_threshold):
+        problems.append(f"same {command_name} on {collection} repeated {times} times (possible N+1)")
+    
+    if not problems:
+        return
+    message = f"{route_path}: " + "; ".join(problems)
+    if settings.query_budget_mode == "raise":
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+class QueryBudgetMiddleware:
+    """ASGI middleware recording Mongo commands per request and enforcing route budgets"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        recorder = QueryRecorder()
+        token = _current_recorder.set(recorder)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_recorder.reset(token)
+        
+        route = match_route(scope)
+        if route is not None:
+            budget = getattr(getattr(route, "endpoint", None), "__query_budget__", settings.query_budget_default)
+            check_query_budget(route.path, budget, recorder)
@@ -0,0 +1,246 @@
+"""Quiz storage helpers shared by the quiz routes and maintenance commands.
+
+Run ``python quiz_store.py backfill-question-counts`` once to denormalize
+``question_count`` onto existing quiz documents.
+
+Quizzes at ``EMBEDDED_SCHEMA_VERSION`` carry their questions in a
+``questions`` array, so fetching or grading one is a single primary-key read.
+Older quizzes keep them in ``quiz_questions``; every reader here handles
+both until ``python quiz_store.py embed-questions`` has converted them all.
+"""
+from pymongo import UpdateOne
+from array import array
+from cache import LRUTTLCache
+from config import settings
+import argparse
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# schema_version of quizzes whose questions are embedded; absent means 1
+EMBEDDED_SCHEMA_VERSION = 2
+
+# Quiz fields the graders read; questions.options.is_correct is only present when embedded
+GRADING_PROJECTION = {
+    "title": 1,
+    "passing_score": 1,
+    "content_version": 1,
+    "schema_version": 1,
+    "questions.options.is_correct": 1
+}
+
+def has_embedded_questions(quiz: dict) -> bool:
+    return quiz.get("schema_version", 1) >= EMBEDDED_SCHEMA_VERSION and "questions" in quiz
+
+async def get_quiz_questions(db, quiz: dict) -> list:
+    """Questions of a quiz document, embedded or from quiz_questions"""
+    if has_embedded_questions(quiz):
+        return quiz["questions"]
+    # Unbounded like the graders and the migration, so what is shown is what is graded
+    return await db.quiz_questions.find(
+        {"quiz_id": str(quiz["_id"])}
+    ).sort("_id", 1).to_list(length=None)
+
+class AnswerKey:
+    """Compiled grading data for one version of a quiz"""
+    
+    __slots__ = ("correct_masks", "option_counts", "passing_score")
+    
+    def __init__(self, questions: list, passing_score: int):
+        # Bit i of a question's mask is set when option i is correct
+        self.correct_masks = array("Q", (
+            sum(1 << i for i, opt in enumerate(q["options"]) if opt["is_correct"])
+            for q in questions
+        ))
+        self.option_counts = array("H", (len(q["options"]) for q in questions))
+        self.passing_score = passing_score
+    
+    @property
+    def total_questions(self) -> int:
+        return len(self.correct_masks)
+    
+    def grade(self, answers: list) -> int:
+        """Number of correct answers; out-of-range indices count as wrong"""
+        return sum(
+            (mask >> answer) & 1
+            for mask, count, answer in zip(self.correct_masks, self.option_counts, answers)
+            if 0 <= answer < count
+        )
+    
+    def grade_many(self, answer_sets: list) -> list:
+        """Correct-answer counts for many submissions of this quiz"""
+        key = list(zip(self.correct_masks, self.option_counts))
+        return [
+            sum(
+                (mask >> answer) & 1
+                for (mask, count), answer in zip(key, answers)
+                if 0 <= answer < count
+            )
+            for answers in answer_sets
+        ]
+
+# Keyed by (quiz_id, content_version); anything that rewrites a quiz's
+# questions must $inc its content_version so stale keys are never hit
+answer_key_cache = LRUTTLCache(
+    maxsize=settings.answer_key_cache_size,
+    ttl=settings.answer_key_cache_ttl_seconds
+)
+
+async def get_answer_keys(db, quizzes: list) -> dict:
+    """Answer keys for many quiz documents, loading every cache miss in one query"""
+    answer_keys = {}
+    misses = []
+    for quiz in quizzes:
+        quiz_id = str(quiz["_id"])
+        answer_key = answer_key_cache.get((quiz_id, quiz.get("content_version", 0)))
+        if answer_key is None:
+            misses.append(quiz)
+        else:
+            answer_keys[quiz_id] = answer_key
+    
+    legacy = []
+    for quiz in misses:
+        if has_embedded_questions(quiz):
+            answer_keys[str(quiz["_id"])] = _compile_answer_key(quiz, quiz["questions"])
+        else:
+            legacy.append(quiz)
+    
+    if legacy:
+        questions_by_quiz = {str(quiz["_id"]): [] for quiz in legacy}
+        async for question in db.quiz_questions.find(
+            {"quiz_id": {"$in": list(questions_by_quiz)}},
+            {"quiz_id": 1, "options": 1},
+            sort=[("_id", 1)]
+        ):
+            questions_by_quiz[question["quiz_id"]].append(question)
+        
+        for quiz in legacy:
+            quiz_id = str(quiz["_id"])
+            answer_keys[quiz_id] = _compile_answer_key(quiz, questions_by_quiz[quiz_id])
+    
+    return answer_keys
+
+def _compile_answer_key(quiz: dict, questions: list) -> AnswerKey:
+    answer_key = AnswerKey(questions, quiz["passing_score"])
+    answer_key_cache.set((str(quiz["_id"]), quiz.get("content_version", 0)), answer_key)
+    return answer_key
+
+async def get_answer_key(db, quiz: dict) -> AnswerKey:
+    """Compiled answer key for a quiz document, loading questions only on a miss"""
+    answer_key = answer_key_cache.get((str(quiz["_id"]), quiz.get("content_version", 0)))
+    if answer_key is None:
+        if has_embedded_questions(quiz):
+            questions = quiz["questions"]
+        else:
+            questions = await db.quiz_questions.find(
+                {"quiz_id": str(quiz["_id"])},
+                {"options": 1}
+            ).sort("_id", 1).to_list(length=None)
+        answer_key = _compile_answer_key(quiz, questions)
+    return answer_key
+
+async def count_questions_by_quiz(db, quiz_ids: list) -> dict:
+    """Question counts for many quizzes in one batched aggregation"""
+    if not quiz_ids:
+        return {}
+    
+    pipeline = [
+        {"$match": {"quiz_id": {"$in": quiz_ids}}},
+        {"$group": {"_id": "$quiz_id", "count": {"$sum": 1}}}
+    ]
+    counts = await db.quiz_questions.aggregate(pipeline).to_list(length=None)
+    return {c["_id"]: c["count"] for c in counts}
+
+async def backfill_question_counts(db) -> int:
+    """Write question_count onto every quiz from a single $group over quiz_questions"""
+    counts = await db.quiz_questions.aggregate([
+        {"$group": {"_id": "$quiz_id", "count": {"$sum": 1}}}
+    ]).to_list(length=None)
+    counts = {c["_id"]: c["count"] for c in counts}
+    
+    # Quizzes without any questions still get an explicit zero
+    operations = []
+    async for quiz in db.quizzes.find({}, {"_id": 1}):
+        quiz_id = str(quiz["_id"])
+        operations.append(UpdateOne(
+            {"_id": quiz["_id"]},
+            {"$set": {"question_count": counts.get(quiz_id, 0)}}
+        ))
+    
+    if operations:
+        await db.quizzes.bulk_write(operations, ordered=False)
+    return len(operations)
+
+async def embed_questions(db, batch_size: int = 100) -> int:
+    """Copy quiz_questions into their quizzes, batch by batch.
+    
+    Only quizzes below EMBEDDED_SCHEMA_VERSION are selected, so an interrupted
+    run resumes where it stopped. Each write is guarded by the content_version
+    that was read; a quiz edited meanwhile is skipped and picked up next run.
+    quiz_questions is left in place for rollback.
+    """
+    migrated = 0
+    last_id = None
+    while True:
+        query = {"schema_version": {"$not": {"$gte": EMBEDDED_SCHEMA_VERSION}}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        quizzes = await db.quizzes.find(
+            query, {"_id": 1, "content_version": 1}
+        ).sort("_id", 1).limit(batch_size).to_list(length=None)
+        if not quizzes:
+            return migrated
+        last_id = quizzes[-1]["_id"]
+        
+        questions_by_quiz = {str(quiz["_id"]): [] for quiz in quizzes}
+        async for question in db.quiz_questions.find(
+            {"quiz_id": {"$in": list(questions_by_quiz)}},
+            {"question": 1, "options": 1, "quiz_id": 1},
+            sort=[("_id", 1)]
+        ):
+            questions_by_quiz[question["quiz_id"]].append({
+                "question": question["question"],
+                "options": question["options"]
+            })
+        
+        operations = []
+        for quiz in quizzes:
+            questions = questions_by_quiz[str(quiz["_id"])]
+            # Match a missing content_version too, for quizzes created before it existed
+            version = quiz.get("content_version")
+            operations.append(UpdateOne(
+                {"_id": quiz["_id"], "content_version": version if version is not None else {"$exists": False}},
+                {"$set": {
+                    "questions": questions,
+                    "question_count": len(questions),
+                    "schema_version": EMBEDDED_SCHEMA_VERSION
+                }}
+            ))
+        result = await db.quizzes.bulk_write(operations, ordered=False)
+        migrated += result.modified_count
+        logger.info(f"Embedded questions into {migrated} quizzes so far")
+
+async def _main(args):
+    from database import connect_to_mongo, close_mongo_connection, get_database
+    
+    await connect_to_mongo()
+    try:
+        db = get_database()
+        if args.command == "backfill-question-counts":
+            updated = await backfill_question_counts(db)
+            logger.info(f"Backfilled question_count on {updated} quizzes")
+        elif args.command == "embed-questions":
+            migrated = await embed_questions(db, args.batch_size)
+            logger.info(f"Embedded questions into {migrated} quizzes")
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Quiz storage maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("backfill-question-counts", help="Denormalize question_count onto quizzes")
+    embed = subparsers.add_parser("embed-questions", help="Move quiz questions into their quiz documents (resumable)")
+    embed.add_argument("--batch-size", type=int, default=100)
+    asyncio.run(_main(parser.parse_args()))
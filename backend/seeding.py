@@ -0,0 +1,108 @@
+"""Bulk, idempotent seeding of the demo catalog.
+
+Run ``python seeding.py`` (or set SEED_ON_STARTUP) to load the courses and
+quizzes from seed_data. A fingerprint of the seed content is stored in the
+``app_meta`` collection so later runs are a single primary-key read.
+"""
+from bson import ObjectId
+from datetime import datetime
+from catalog_cache import invalidate_catalog_cache
+from quiz_store import EMBEDDED_SCHEMA_VERSION
+from seed_data import DUMMY_COURSES, DUMMY_QUIZZES
+import argparse
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+SEED_MARKER_ID = "seed"
+
+def seed_fingerprint() -> str:
+    """Hash of the seed content, ignoring the import-time created_at stamps"""
+    courses = [{k: v for k, v in c.items() if k != "created_at"} for c in DUMMY_COURSES]
+    raw = json.dumps({"courses": courses, "quizzes": DUMMY_QUIZZES}, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def build_seed_documents() -> tuple:
+    """Courses and quizzes (questions embedded) with client-side ids, leaving seed_data untouched"""
+    now = datetime.utcnow()
+    courses = []
+    for course_data in copy.deepcopy(DUMMY_COURSES):
+        course_data["_id"] = ObjectId()
+        courses.append(course_data)
+    
+    quizzes = []
+    for quiz_data in copy.deepcopy(DUMMY_QUIZZES):
+        course_index = quiz_data.pop("course_index")
+        quiz_data["_id"] = ObjectId()
+        quiz_data["course_id"] = str(courses[course_index]["_id"])
+        quiz_data["created_at"] = now
+        quiz_data["question_count"] = len(quiz_data["questions"])
+        quiz_data["content_version"] = 1
+        # Fresh catalogs start in the embedded layout; quiz_questions is only read for older quizzes
+        quiz_data["schema_version"] = EMBEDDED_SCHEMA_VERSION
+        quizzes.append(quiz_data)
+    
+    return courses, quizzes
+
+async def _supports_transactions(client) -> bool:
+    """Transactions need a replica set or a sharded cluster"""
+    hello = await client.admin.command("hello")
+    return "setName" in hello or hello.get("msg") == "isdbgrid"
+
+async def _insert_seed_documents(db, courses, quizzes, session=None):
+    await db.courses.insert_many(courses, session=session)
+    await db.quizzes.insert_many(quizzes, session=session)
+
+async def seed_database(db, client=None, force: bool = False) -> bool:
+    """Seed the demo catalog once; returns True when documents were written"""
+    fingerprint = seed_fingerprint()
+    marker = await db.app_meta.find_one({"_id": SEED_MARKER_ID})
+    if marker and marker.get("fingerprint") == fingerprint and not force:
+        return False
+    
+    seeded = False
+    if force or await db.courses.estimated_document_count() == 0:
+        courses, quizzes = build_seed_documents()
+        logger.info(
+            f"Seeding {len(courses)} courses and {len(quizzes)} quizzes "
+            f"with {sum(quiz['question_count'] for quiz in quizzes)} questions..."
+        )
+        
+        if client is not None and await _supports_transactions(client):
+            async with await client.start_session() as session:
+                async with session.start_transaction():
+                    await _insert_seed_documents(db, courses, quizzes, session=session)
+        else:
+            await _insert_seed_documents(db, courses, quizzes)
+        
+        invalidate_catalog_cache()
+        seeded = True
+        logger.info("Dummy data seeding completed!")
+    else:
+        logger.info("Catalog already populated, recording seed fingerprint only")
+    
+    await db.app_meta.update_one(
+        {"_id": SEED_MARKER_ID},
+        {"$set": {"fingerprint": fingerprint, "seeded_at": datetime.utcnow()}},
+        upsert=True
+    )
+    return seeded
+
+async def _main(args):
+    from database import connect_to_mongo, close_mongo_connection, get_database, db as database
+    
+    await connect_to_mongo()
+    try:
+        await seed_database(get_database(), database.client, force=args.force)
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Seed the demo courses and quizzes")
+    parser.add_argument("--force", action="store_true", help="Insert the seed documents even if already seeded")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,43 @@
+from fastapi.responses import JSONResponse
+from bson import ObjectId
+from typing import Any, Iterable
+import orjson
+
+def _default(value: Any):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    """orjson encoding with native datetime support and ObjectId as string"""
+    return orjson.dumps(content, default=_default)
+
+class FastJSONResponse(JSONResponse):
+    """orjson-backed response for content that needs no further validation"""
+    
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+# Per-model (field name, default) pairs, computed once per response model
+_model_fields = {}
+
+def _fields_for(model) -> list:
+    fields = _model_fields.get(model)
+    if fields is None:
+        fields = [
+            (name, None if field.is_required() else field.get_default(call_default_factory=True))
+            for name, field in model.model_fields.items()
+            if name != "id"
+        ]
+        _model_fields[model] = fields
+    return fields
+
+def document_to_dict(model, document: dict) -> dict:
+    """Shape a document from our own database like `model`, skipping validation"""
+    item = {"id": str(document["_id"])}
+    for name, default in _fields_for(model):
+        item[name] = document.get(name, default)
+    return item
+
+def documents_to_dicts(model, documents: Iterable[dict]) -> list:
+    return [document_to_dict(model, document) for document in documents]
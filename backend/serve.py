@@ -0,0 +1,52 @@
+"""Production entry point: runs uvicorn with one worker per available CPU.
+
+Set WEB_CONCURRENCY to override the worker count.
+"""
+from config import settings
+import math
+import os
+import uvicorn
+
+# Each worker holds its own Mongo pool, bcrypt pool and caches
+MAX_DEFAULT_WORKERS = 8
+
+def _cgroup_cpu_limit():
+    """CPU quota of the container, or None when unlimited or unknown"""
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota == "max":
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        # cgroup v1: a quota of -1 means unlimited
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        return quota / period if quota > 0 and period > 0 else None
+    except (OSError, ValueError):
+        return None
+
+def default_worker_count() -> int:
+    """CPUs this process may use, respecting affinity and cgroup quotas, capped"""
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit()
+    if limit is not None:
+        # A 0.5-CPU instance gets one worker, not one per host core
+        cpus = min(cpus, math.floor(limit))
+    return min(max(cpus, 1), MAX_DEFAULT_WORKERS)
+
+if __name__ == "__main__":
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=int(os.environ.get("PORT", 8000)),
+        workers=settings.web_concurrency or default_worker_count(),
+    )
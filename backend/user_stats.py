@@ -0,0 +1,279 @@
+"""Incrementally maintained per-user dashboard statistics.
+
+One document per user in the ``user_stats`` collection, keyed by user id,
+updated with ``$inc``/``$push``+``$sort``+``$slice`` on the enrollment and quiz
+attempt write paths so the dashboard is a single primary-key read.
+
+The write paths only update existing documents (``upsert=False``); a
+missing or incomplete document is built from ``enrollments`` and
+``quiz_results`` on first read, so users who predate the collection keep
+their history. Run ``python user_stats.py rebuild`` to backfill or repair drift.
+"""
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime
+import argparse
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+RECENT_ITEMS = 5
+REBUILD_ATTEMPTS = 3
+
+def _empty_stats(user_id: str) -> dict:
+    return {
+        "_id": user_id,
+        "enrolled_courses": 0,
+        "completed_courses": 0,
+        "attempted_quizzes": 0,
+        "score_sum": 0.0,
+        "recent_enrollments": [],
+        "recent_quiz_results": [],
+        "updated_at": datetime.utcnow()
+    }
+
+async def record_enrollment(db, user_id: str, enrollment: dict, course_title: str):
+    """Count a new enrollment and push it onto the recent list"""
+    await record_enrollments(db, [(enrollment, course_title)])
+
+async def record_enrollments(db, enrollments: list):
+    """Count (enrollment, course_title) pairs, possibly of many users, in one bulk write"""
+    by_user = {}
+    for enrollment, course_title in enrollments:
+        by_user.setdefault(enrollment["user_id"], []).append((enrollment, course_title))
+    
+    now = datetime.utcnow()
+    updates = []
+    for user_id, items in by_user.items():
+        recent = sorted(items, key=lambda item: item[0]["enrolled_at"], reverse=True)[:RECENT_ITEMS]
+        updates.append(UpdateOne(
+            {"_id": user_id},
+            {
+                "$inc": {"enrolled_courses": len(items)},
+                "$push": {"recent_enrollments": {
+                    "$each": [
+                        {
+                            "course_id": enrollment["course_id"],
+                            "course_title": course_title,
+                            "enrolled_at": enrollment["enrolled_at"],
+                            "progress": enrollment["progress"]
+                        }
+                        for enrollment, course_title in recent
+                    ],
+                    "$sort": {"enrolled_at": -1},
+                    "$slice": RECENT_ITEMS
+                }},
+                "$set": {"updated_at": now}
+            },
+            upsert=False
+        ))
+    if updates:
+        await db.user_stats.bulk_write(updates, ordered=False)
+
+async def record_course_completed(db, user_id: str, amount: int = 1):
+    """Count a course that just became completed (or -1 when it no longer is)"""
+    await db.user_stats.update_one(
+        {"_id": user_id},
+        {"$inc": {"completed_courses": amount}, "$set": {"updated_at": datetime.utcnow()}},
+        upsert=False
+    )
+
+async def record_enrollment_progress(db, user_id: str, course_id: str, progress: float):
+    """Refresh the progress shown for a course in the recent enrollments list"""
+    await db.user_stats.update_one(
+        {"_id": user_id, "recent_enrollments.course_id": course_id},
+        {"$set": {"recent_enrollments.$[e].progress": progress}},
+        array_filters=[{"e.course_id": course_id}]
+    )
+
+async def record_quiz_result(db, user_id: str, result: dict, quiz_title: str):
+    """Count a quiz attempt, add its score and push it onto the recent list"""
+    await record_quiz_results(db, user_id, [(result, quiz_title)])
+
+async def record_quiz_results(db, user_id: str, results: list):
+    """Count several (result, quiz_title) attempts of one user in a single update"""
+    recent = sorted(results, key=lambda item: item[0]["attempted_at"], reverse=True)[:RECENT_ITEMS]
+    await db.user_stats.update_one(
+        {"_id": user_id},
+        {
+            "$inc": {
+                "attempted_quizzes": len(results),
+                "score_sum": sum(result["score"] for result, _ in results)
+            },
+            "$push": {"recent_quiz_results": {
+                "$each": [
+                    {
+                        "quiz_id": result["quiz_id"],
+                        "quiz_title": quiz_title,
+                        "score": result["score"],
+                        "correct_answers": result["correct_answers"],
+                        "total_questions": result["total_questions"],
+                        "passed": result["passed"],
+                        "attempted_at": result["attempted_at"]
+                    }
+                    for result, quiz_title in recent
+                ],
+                # Replayed attempts can be older than what is already listed
+                "$sort": {"attempted_at": -1},
+                "$slice": RECENT_ITEMS
+            }},
+            "$set": {"updated_at": datetime.utcnow()}
+        },
+        upsert=False
+    )
+
+def _recent_lookup(sort_field: str, local_id: str, from_collection: str, as_field: str, project: dict) -> list:
+    """Pipeline stages for the latest items joined to their parent document"""
+    return [
+        {"$sort": {sort_field: -1}},
+        {"$limit": RECENT_ITEMS},
+        {"$addFields": {"parent_oid": {
+            "$convert": {"input": f"${local_id}", "to": "objectId", "onError": None, "onNull": None}
+        }}},
+        {"$lookup": {
+            "from": from_collection,
+            "localField": "parent_oid",
+            "foreignField": "_id",
+            "as": as_field
+        }},
+        {"$unwind": f"${as_field}"},
+        {"$project": {"_id": 0, **project}}
+    ]
+
+async def compute_user_stats(db, user_id: str) -> dict:
+    """Recompute a user's stats document from enrollments and quiz_results"""
+    enrollment_pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$facet": {
+            "counts": [
+                {"$group": {
+                    "_id": None,
+                    "enrolled": {"$sum": 1},
+                    "completed": {"$sum": {"$cond": ["$completed", 1, 0]}}
+                }}
+            ],
+            "recent": _recent_lookup("enrolled_at", "course_id", "courses", "course", {
+                "course_id": 1,
+                "course_title": "$course.title",
+                "enrolled_at": 1,
+                "progress": 1
+            })
+        }}
+    ]
+    
+    quiz_result_pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$facet": {
+            "counts": [
+                {"$group": {
+                    "_id": None,
+                    "attempted": {"$sum": 1},
+                    "score_sum": {"$sum": "$score"}
+                }}
+            ],
+            "recent": _recent_lookup("attempted_at", "quiz_id", "quizzes", "quiz", {
+                "quiz_id": 1,
+                "quiz_title": "$quiz.title",
+                "score": 1,
+                "correct_answers": {"$ifNull": ["$correct_answers", 0]},
+                "total_questions": {"$ifNull": ["$total_questions", 0]},
+                "passed": 1,
+                "attempted_at": 1
+            })
+        }}
+    ]
+    
+    enrollment_facets, quiz_result_facets = await asyncio.gather(
+        db.enrollments.aggregate(enrollment_pipeline).to_list(length=1),
+        db.quiz_results.aggregate(quiz_result_pipeline).to_list(length=1)
+    )
+    enrollment_facets = enrollment_facets[0]
+    quiz_result_facets = quiz_result_facets[0]
+    enrollment_counts = enrollment_facets["counts"][0] if enrollment_facets["counts"] else {}
+    quiz_result_counts = quiz_result_facets["counts"][0] if quiz_result_facets["counts"] else {}
+    
+    stats = _empty_stats(user_id)
+    stats.update({
+        "enrolled_courses": enrollment_counts.get("enrolled", 0),
+        "completed_courses": enrollment_counts.get("completed", 0),
+        "attempted_quizzes": quiz_result_counts.get("attempted", 0),
+        "score_sum": float(quiz_result_counts.get("score_sum", 0)),
+        "recent_enrollments": enrollment_facets["recent"],
+        "recent_quiz_results": quiz_result_facets["recent"]
+    })
+    return stats
+
+# Counters every complete stats document carries
+STAT_FIELDS = ("enrolled_courses", "completed_courses", "attempted_quizzes", "score_sum")
+
+async def rebuild_user_stats(db, user_id: str) -> dict:
+    """Recompute and store a single user's stats document"""
+    stats = await compute_user_stats(db, user_id)
+    await db.user_stats.replace_one({"_id": user_id}, stats, upsert=True)
+    return stats
+
+async def _create_user_stats(db, user_id: str) -> dict:
+    """Compute and insert a missing stats document without losing concurrent writes"""
+    stats = await compute_user_stats(db, user_id)
+    try:
+        await db.user_stats.insert_one(stats)
+    except DuplicateKeyError:
+        # Another request created it first and later writes may already
+        # have been applied to that copy, so it wins
+        return await db.user_stats.find_one({"_id": user_id})
+    
+    # A write whose source row landed after the compute read, but whose stats
+    # update ran before the insert, was a no-op. Recompute now that the document
+    # exists; replace it only if no write has changed its counters since (those
+    # writes already applied their own $inc), otherwise recompute again.
+    for _ in range(REBUILD_ATTEMPTS):
+        fresh = await compute_user_stats(db, user_id)
+        unchanged = {field: stats[field] for field in STAT_FIELDS}
+        result = await db.user_stats.replace_one({"_id": user_id, **unchanged}, fresh)
+        if result.matched_count:
+            return fresh
+        stats = await db.user_stats.find_one({"_id": user_id})
+    logger.warning(f"Stats of user {user_id} kept changing while being built; run 'user_stats.py rebuild --user {user_id}' if they drift")
+    return stats
+
+async def get_user_stats(db, user_id: str) -> dict:
+    """Read a user's stats, building it the first time it is missing"""
+    stats = await db.user_stats.find_one({"_id": user_id})
+    if stats is None:
+        stats = await _create_user_stats(db, user_id)
+    elif not all(field in stats for field in STAT_FIELDS):
+        # Partial document upserted by an earlier version of the write paths
+        stats = await rebuild_user_stats(db, user_id)
+    return stats
+
+async def rebuild_all_user_stats(db) -> int:
+    """Recompute the stats document of every user"""
+    rebuilt = 0
+    async for user in db.users.find({}, {"_id": 1}):
+        await rebuild_user_stats(db, str(user["_id"]))
+        rebuilt += 1
+    return rebuilt
+
+async def _main(args):
+    from database import connect_to_mongo, close_mongo_connection, get_database
+    
+    await connect_to_mongo()
+    try:
+        db = get_database()
+        if args.user:
+            await rebuild_user_stats(db, args.user)
+            logger.info(f"Rebuilt stats for user {args.user}")
+        else:
+            rebuilt = await rebuild_all_user_stats(db)
+            logger.info(f"Rebuilt stats for {rebuilt} users")
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Maintain the user_stats collection")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = subparsers.add_parser("rebuild", help="Recompute stats from enrollments and quiz_results")
+    rebuild_parser.add_argument("--user", help="Only rebuild this user id")
+    asyncio.run(_main(parser.parse_args()))